@@ -0,0 +1,115 @@
+'''
+Pre-aggregated month x category x transactionType x account x sign cube of transaction sums
+'''
+
+import json
+import os
+
+# Columns a frame passed to AggregateCube.add_frame must have (plus amount_cents)
+CUBE_COLUMNS = ['month', 'category_id', 'transaction_type', 'account_id', 'sign']
+
+class AggregateCube:
+    """
+    Sums (in cents) and counts of transactions keyed by month, category id,
+    transactionType, account id and sign (-1 expense, 0, 1 income).
+
+    Cells are grouped by month, so a query for one month only touches that
+    month's handful of cells instead of every transaction. The cube is kept
+    up to date by adding new rows and subtracting replaced ones rather than
+    being rebuilt. `timezone` records which local calendar the month keys
+    belong to.
+    """
+
+    def __init__(self, months=None, timezone=None):
+        # month -> {(category_id, transaction_type, account_id, sign): [sum_cents, count]}
+        self.months = months or {}
+        self.timezone = timezone
+
+    @classmethod
+    def from_frame(cls, frame, timezone=None):
+        """Build a cube from a frame with CUBE_COLUMNS and amount_cents"""
+        cube = cls(timezone=timezone)
+        cube.add_frame(frame)
+        return cube
+
+    def add(self, month, category_id, transaction_type, account_id, amount_cents, weight=1):
+        """Add (weight=1) or remove (weight=-1) a single transaction in O(1)"""
+        sign = (amount_cents > 0) - (amount_cents < 0)
+        self._add_cell(month, (category_id, transaction_type, account_id, sign), weight * amount_cents, weight)
+
+    def add_frame(self, frame, weight=1):
+        """Add (weight=1) or remove (weight=-1) every row of a frame, one update per group"""
+        if frame.empty:
+            return
+        grouped = frame.groupby(CUBE_COLUMNS, observed=True, dropna=False)['amount_cents'].agg(['sum', 'count'])
+        for (month, category_id, transaction_type, account_id, sign), row in grouped.iterrows():
+            key = (_none_if_missing(category_id), transaction_type, account_id, int(sign))
+            self._add_cell(month, key, weight * int(row['sum']), weight * int(row['count']))
+
+    def _add_cell(self, month, key, amount_cents, count):
+        cells = self.months.setdefault(month, {})
+        cell = cells.setdefault(key, [0, 0])
+        cell[0] += amount_cents
+        cell[1] += count
+        if cell[1] == 0:
+            del cells[key]
+            if not cells:
+                del self.months[month]
+
+    def cells(self, month=None, transaction_types=None, exclude_types=(), sign=None, exclude_categories=('transfer',)):
+        """Yield (month, category_id, transaction_type, account_id, sign, sum_cents, count) for matching cells"""
+        months = [month] if month is not None else sorted(self.months)
+        for cell_month in months:
+            for (category_id, transaction_type, account_id, cell_sign), (sum_cents, count) in self.months.get(cell_month, {}).items():
+                if category_id in exclude_categories or transaction_type in exclude_types:
+                    continue
+                if transaction_types is not None and transaction_type not in transaction_types:
+                    continue
+                if sign is not None and cell_sign != sign:
+                    continue
+                yield cell_month, category_id, transaction_type, account_id, cell_sign, sum_cents, count
+
+    def total_cents(self, **filters):
+        """Sum in cents of the cells matching the filters accepted by cells()"""
+        return sum(cell[5] for cell in self.cells(**filters))
+
+    def months_with(self, **filters):
+        """Sorted months that have at least one matching transaction"""
+        return sorted({cell[0] for cell in self.cells(**filters) if cell[6] > 0})
+
+    def to_json(self):
+        """Flat JSON-serializable rows of [month, *key, sum_cents, count]"""
+        return [
+            [month, *key, sum_cents, count]
+            for month, cells in self.months.items()
+            for key, (sum_cents, count) in cells.items()
+        ]
+
+    @classmethod
+    def from_json(cls, rows, timezone=None):
+        """Rebuild a cube from to_json() rows"""
+        cube = cls(timezone=timezone)
+        for month, category_id, transaction_type, account_id, sign, sum_cents, count in rows:
+            cube._add_cell(month, (category_id, transaction_type, account_id, sign), sum_cents, count)
+        return cube
+
+    def save(self, path):
+        """Write the cube atomically"""
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump({'timezone': self.timezone, 'cells': self.to_json()}, f)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        """Read a cube written by save()"""
+        with open(path, 'r') as f:
+            data = json.load(f)
+        # Cubes saved before timezones were recorded are a bare list of rows
+        if isinstance(data, list):
+            return cls.from_json(data)
+        return cls.from_json(data['cells'], data.get('timezone'))
+
+def _none_if_missing(value):
+    # groupby(dropna=False) hands back NaN for missing category ids
+    return None if value != value else value
@@ -1,23 +1,31 @@
 import streamlit as st
-import pandas as pd
-import plotly.express as px
 import numpy as np
-from datetime import datetime, timedelta
-import calendar
+from datetime import timedelta
 from up_api_service import (
     format_transactions_for_dashboard, 
+    load_snapshot,
+    invalidate_snapshot,
+    background_refresh_error,
+    stop_background_refresh,
     get_monthly_income,
-    get_monthly_expenses_by_category,
     get_monthly_spending_trends,
     get_total_balance,
     get_estimated_annual_income, 
-  
+    TREND_MAX_POINTS
 )
 from finance_recommendations import calculate_spending_limits
+from transaction_list import render_transaction_list
+from dashboard_views import daily_view_data, monthly_view_data, spending_trend_figure, weekly_view_data
+from transaction_store import DEFAULT_TIMEZONE
+from up_client import UpApiError, UpAuthError
+from timing import span, start_run
 import up_api_service
 import pytz
 from streamlit_cookies_manager import EncryptedCookieManager
 
+# Collect this rerun's timing spans (see the debug view)
+start_run()
+
 # Page configuration
 st.set_page_config(
     page_title="Personal Finance Dashboard",
@@ -94,15 +102,53 @@ if not st.session_state['UP_API_TOKEN']:
 
 # Add a logout button
 if st.button("Logout"):
+    stop_background_refresh()
+    invalidate_snapshot()
     st.session_state['UP_API_TOKEN'] = ''
     cookies['UP_API_TOKEN'] = ''
     cookies.save()
     st.experimental_rerun()
 
-# Load and process data for visualizations
-expenses_df = format_transactions_for_dashboard()
+# Force the next load to refetch from the API instead of reusing the snapshot
+if st.button("Refresh"):
+    invalidate_snapshot()
+
+# Dates are shown in the user's timezone, remembered in a cookie like the token
+if not st.session_state.get('UP_TIMEZONE'):
+    st.session_state['UP_TIMEZONE'] = cookies.get('UP_TIMEZONE') or DEFAULT_TIMEZONE
+# A stale cookie may name a zone pytz no longer knows; valid zones outside the common list are offered too
+if st.session_state['UP_TIMEZONE'] not in pytz.all_timezones_set:
+    st.session_state['UP_TIMEZONE'] = DEFAULT_TIMEZONE
+timezones = list(pytz.common_timezones)
+if st.session_state['UP_TIMEZONE'] not in timezones:
+    timezones.insert(0, st.session_state['UP_TIMEZONE'])
+user_timezone = st.selectbox("Timezone", timezones, index=timezones.index(st.session_state['UP_TIMEZONE']))
+if user_timezone != st.session_state['UP_TIMEZONE']:
+    # load_snapshot() rebuilds the calendar columns for the new timezone; the old one's worker is not needed
+    stop_background_refresh()
+    st.session_state['UP_TIMEZONE'] = user_timezone
+    cookies['UP_TIMEZONE'] = user_timezone
+    cookies.save()
+
+# Load and process data for visualizations (fetched at most once per snapshot TTL)
+try:
+    with span('load_snapshot'):
+        snapshot = load_snapshot()
+except UpAuthError:
+    st.error("Your Up Banking API token was rejected. Please log out and log in with a valid token.")
+    st.stop()
+except UpApiError as e:
+    st.error(f"Could not load data from Up Banking: {str(e)}")
+    st.stop()
+expenses_df = format_transactions_for_dashboard(snapshot)
 
-today = datetime.now()
+# The snapshot is refreshed in the background, so show how current it is
+st.caption(f"Last synced {snapshot.synced_at().strftime('%d %b %Y %H:%M:%S')} ({snapshot.age_seconds():.0f}s ago)")
+refresh_error = background_refresh_error()
+if refresh_error is not None:
+    st.warning(f"Background sync is failing, showing the last synced data: {str(refresh_error)}")
+
+today = snapshot.now()
 # Find the Monday of the current week
 monday = today - timedelta(days=today.weekday())
 # List all days in the current week (Monday to Sunday)
@@ -115,7 +161,7 @@ with st.container():
     with cols[0]:
         st.header("📃 Expense Tracking")
     with cols[1]:
-        total_balance = get_total_balance()
+        total_balance = get_total_balance(snapshot)
         st.metric("Total Balance", f"${total_balance:.2f}")
     with cols[2]:
         donate_url = "https://buy.stripe.com/test_eVq7sNfF8f22g171t5gw000"  # Change to your donation link
@@ -125,59 +171,36 @@ with st.container():
             </a>
         """, unsafe_allow_html=True)
     
-    # Daily, Weekly, Monthly tabs for expense tracking
-    tracking_tab = st.tabs(["Daily Expenses", "Weekly Breakdown", "Monthly Overview"])
+    # Daily, Weekly, Monthly views for expense tracking. Unlike st.tabs, which runs every tab's
+    # body on each rerun, only the selected view is computed, and its data is cached on the snapshot
+    views = ["Daily Expenses", "Weekly Breakdown", "Monthly Overview"]
+    active_view = st.radio("View", views, horizontal=True, label_visibility="collapsed", key='active_view')
     
     # Daily Expenses View
-    with tracking_tab[0]:
-        try:
-            if not expenses_df.empty:
-                # Get the current month name and year
-                current_month = datetime.now().strftime("%B %Y")
-                
-                # Calculate the total spent this month
-                this_month_expenses = expenses_df[expenses_df['date'].dt.strftime('%Y-%m') == datetime.now().strftime('%Y-%m')].copy()
-                total_month = this_month_expenses['amount'].abs().sum()
-                
-                # Calculate average monthly spending
-                previous_months = expenses_df['date'].dt.strftime('%Y-%m').unique()
-                if len(previous_months) > 1:
-                    usual_spending = this_month_expenses['amount'].abs().sum() / len(this_month_expenses)
-                    difference = total_month - usual_spending
-                    difference_text = f"${abs(difference):.2f} {'more' if difference > 0 else 'less'} than usual"
-                else:
-                    difference_text = ""
-                
-                # Get unique days in the current month with transactions
-                unique_days = sorted(this_month_expenses['date'].dt.day.unique())
-                if 'selected_day' not in st.session_state:
-                    st.session_state['selected_day'] = week_days[today.weekday()]
-                selected_day_label = st.session_state['selected_day']
-                selected_day_index = week_days.index(selected_day_label)
-                selected_date = week_dates[selected_day_index]
+    if active_view == views[0]:
+        with span('tab.daily'):
+            try:
+                if not expenses_df.empty:
+                    if 'selected_day' not in st.session_state:
+                        st.session_state['selected_day'] = week_days[today.weekday()]
+                    selected_day_label = st.session_state['selected_day']
+                    selected_day_index = week_days.index(selected_day_label)
+                    selected_date = week_dates[selected_day_index]
 
-                # Filter transactions for the selected day, excluding 'Transfer' and 'Round Up'
-                selected_date_df = this_month_expenses[
-                    (this_month_expenses['date'].dt.date == selected_date) &
-                    (~this_month_expenses['transactionType'].isin(['Transfer', 'Round Up']))
-                ]
-                day_total = selected_date_df['amount'].sum()
-                st.info("Only transactions coming in and out of your bank account are included. Transfers or round ups between savings accounts (e.g., 'Transfer', 'Round Up') are excluded from this view.")
-                # Show total spend
-                 # Display totals and transaction count in a nice layout
-                summary_cols = st.columns([3, 1])
-                with summary_cols[0]:
-                    st.markdown(f"**{len(selected_date_df)} transactions on selected date**")
-                with summary_cols[1]:
-                    st.markdown(f"### ${day_total:.2f}")
+                    daily = snapshot.view_data(('daily', selected_date), lambda: daily_view_data(snapshot, selected_date))
+                    selected_date_df = daily['selected_date_df']
+                    day_total = daily['day_total']
+                    st.info("Only transactions coming in and out of your bank account are included. Transfers or round ups between savings accounts (e.g., 'Transfer', 'Round Up') are excluded from this view.")
+                    # Show total spend
+                     # Display totals and transaction count in a nice layout
+                    summary_cols = st.columns([3, 1])
+                    with summary_cols[0]:
+                        st.markdown(f"**{len(selected_date_df)} transactions on selected date**")
+                    with summary_cols[1]:
+                        st.markdown(f"### ${day_total:.2f}")
                 
-                # Show transaction list with reduced padding
-                for idx, row in selected_date_df.iterrows():
-                    st.markdown(
-                        f"<div style='padding:4px 0; border-bottom:1px solid #eee;'>"
-                        f"<b>{row['description']}</b> <span style='float:right;'>${row['amount']:.2f}</span>"
-                        f"</div>", unsafe_allow_html=True
-                    )
+                    # Show transaction list with reduced padding, newest first, one page per markdown element
+                    render_transaction_list(selected_date_df.iloc[::-1], key=f"daily_{selected_date}")
                 
             
                 
@@ -186,162 +209,99 @@ with st.container():
                 
                 
                
-            else:
-                st.info("No transaction data available")
-        except Exception as e:
-            st.error(f"Error in Daily Expenses view: {str(e)}")
-            import traceback
-            st.code(traceback.format_exc())
+                else:
+                    st.info("No transaction data available")
+            except Exception as e:
+                st.error(f"Error in Daily Expenses view: {str(e)}")
+                import traceback
+                st.code(traceback.format_exc())
     
     # Weekly Expenses View
-    with tracking_tab[1]:
-        st.subheader("Weekly Spending Breakdown")
+    elif active_view == views[1]:
+        with span('tab.weekly'):
+            st.subheader("Weekly Spending Breakdown")
         
-        try:
-            if not expenses_df.empty:
-                perth_tz = pytz.timezone("Australia/Perth")
-                # Convert the 'date' column to Perth time zone
-                expenses_df['date_perth'] = expenses_df['date'].dt.tz_convert(perth_tz)
-                today_perth = datetime.now(perth_tz).date()
-                # Set week_start to the most recent Monday and week_end to the upcoming Sunday
-                week_start = today_perth - timedelta(days=today_perth.weekday())
-                week_end = week_start + timedelta(days=6)
+            try:
+                if not expenses_df.empty:
+                    # Set week_start to the most recent Monday and week_end to the upcoming Sunday
+                    week_start = today.date() - timedelta(days=today.weekday())
+                    week_end = week_start + timedelta(days=6)
                 
-                weekly_expenses = expenses_df[
-                    (expenses_df['date_perth'].dt.date >= week_start) &
-                    (expenses_df['date_perth'].dt.date <= week_end) &
-                    (~expenses_df['transactionType'].isin(['Transfer', 'Round Up']))
-                ].copy()
+                    weekly = snapshot.view_data(('weekly', week_start), lambda: weekly_view_data(snapshot, week_start))
    
-                if not weekly_expenses.empty:
-                    # Add a day column for grouping
-                    weekly_expenses['day'] = weekly_expenses['date'].dt.date
-                    weekly_expenses['day_name'] = weekly_expenses['date'].dt.strftime('%a')
-                    
-                    # Before grouping for the chart, filter for expenses only
-                    weekly_expenses_expense_only = weekly_expenses[weekly_expenses['amount'] < 0]
-                    daily_category_spend = weekly_expenses_expense_only.groupby(['day', 'day_name', 'category'])['amount'].sum().reset_index()
-                    daily_category_spend['amount'] = daily_category_spend['amount'].abs()  # Ensure all amounts are positive
-                    
-                    # Calculate total amount spent for each day
-                    daily_totals = daily_category_spend.groupby('day')['amount'].sum().reset_index()
-                    daily_totals['total_text'] = daily_totals['amount'].apply(lambda x: f"${x:.2f}")
+                    if weekly is not None:
+                        daily_category_spend = weekly['daily_category_spend']
 
-                    # Create a stacked bar chart showing daily spending by category
-                    fig = px.bar(
-                        daily_category_spend,
-                        x='day',
-                        y='amount',
-                        color='category',
-                        title='Expenses by Day',
-                        labels={'day': 'Date', 'amount': 'Amount ($)', 'category': 'Category'},
-                        color_discrete_sequence=px.colors.qualitative.Prism,
-                        text='category',  # Show category names in the bars
-                        barmode='stack'    # Ensure bars are stacked
-                    )
-
-                    # Add total amount spent for each day on top of the chart
-                    for i, row in daily_totals.iterrows():
-                        fig.add_annotation(
-                            x=row['day'],
-                            y=row['amount'],
-                            text=row['total_text'],
-                            showarrow=False,
-                            yshift=10
-                        )
-                    
-                    # Customize the layout for a cleaner look
-                    fig.update_layout(
-                        margin=dict(t=40, b=0, l=0, r=0),
-                        legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1),
-                        xaxis=dict(title="Day of Week", tickformat="%a, %b %d"),
-                        yaxis=dict(title="Amount ($)"),
-                        plot_bgcolor='#1E1E1E',
-                        bargap=0.2
-                    )
-                    
-                    # Hide category text inside small bars
-                    fig.update_traces(textposition='none')
-
-                        # Calculate weekly total
-                    weekly_total = weekly_expenses[weekly_expenses['amount'] < 0]['amount'].abs().sum()
-                    
-                    # Show weekly summary
-                    st.metric("Total Weekly Spending", f"${weekly_total:.2f}")
+                        # Show weekly summary
+                        weekly_total = weekly['weekly_total']
+                        st.metric("Total Weekly Spending", f"${weekly_total:.2f}")
                     
-                    # Display the chart
-                    st.plotly_chart(fig, use_container_width=True, config={"displayModeBar": False})
+                        # Display the chart
+                        with span('render.weekly_chart'):
+                            st.plotly_chart(weekly['figure'], use_container_width=True, config={"displayModeBar": False})
                     
                     
                   
                     
-                    # Add information about the date range
-                    st.markdown(f"*Showing data from {week_start.strftime('%B %d, %Y')} to {week_end.strftime('%B %d, %Y')}*")
+                        # Add information about the date range
+                        st.markdown(f"*Showing data from {week_start.strftime('%B %d, %Y')} to {week_end.strftime('%B %d, %Y')}*")
                     
-                    # Get categories shown in the bar chart
-                    categories_in_chart = daily_category_spend['category'].unique()
+                        # Get categories shown in the bar chart
+                        categories_in_chart = daily_category_spend['category'].unique()
                  
                
+                    else:
+                        st.info("No expenses recorded in the past week.")
                 else:
-                    st.info("No expenses recorded in the past week.")
-            else:
-                st.info("No transaction data available")
-        except Exception as e:
-            st.error(f"Error in Weekly Expenses view: {str(e)}")
-            import traceback
-            st.code(traceback.format_exc())
+                    st.info("No transaction data available")
+            except Exception as e:
+                st.error(f"Error in Weekly Expenses view: {str(e)}")
+                import traceback
+                st.code(traceback.format_exc())
     
     # Monthly Expenses View
-    with tracking_tab[2]:
-        st.subheader("Monthly Spending Overview")
+    elif active_view == views[2]:
+        with span('tab.monthly'):
+            st.subheader("Monthly Spending Overview")
         
-        try:
-            if not expenses_df.empty:
-                # Create columns for visualizations
-                col1, col2 = st.columns(2)
+            try:
+                if not expenses_df.empty:
+                    # Create columns for visualizations
+                    col1, col2 = st.columns(2)
                 
-                # Get monthly expenses by category
-                category_expenses = get_monthly_expenses_by_category()
-
-                # Calculate percentage of total
+                    # Get monthly expenses by category
+                    monthly = snapshot.view_data(('monthly', snapshot.current_month()), lambda: monthly_view_data(snapshot))
           
-                if category_expenses:
+                    if monthly is not None:
+                        total_expenses = monthly['total_expenses']
 
-                    # Create dataframe for visualization
-                    category_data = pd.DataFrame({
-                        'category': list(category_expenses.keys()),
-                        'amount': list(category_expenses.values())
-                    })
-                    
-                    category_data = category_data.sort_values('amount', ascending=False)
-                    total_expenses = category_data['amount'].sum()
-                    category_data['percentage'] = (category_data['amount'] / total_expenses * 100).round(1)
-                    category_data = category_data.rename(columns={'amount': 'Amount ($)', 'category': 'Category', 'percentage': 'Percentage (%)'})
-                    
-
-                    st.metric("Total Monthly Spending", f"${total_expenses:.2f}")
-                    # Create pie chart
-                    fig = px.pie(
-                        category_data, 
-                        values='Amount ($)', 
-                        names='Category',
-                        title='Monthly Spending by Category',
-                        color_discrete_sequence=px.colors.qualitative.Pastel,
-                        hole=0.4
-                    )
-                    fig.update_layout(margin=dict(t=40, b=0, l=0, r=0))
-                    st.plotly_chart(fig, use_container_width=True, config={"displayModeBar": False})
+                        st.metric("Total Monthly Spending", f"${total_expenses:.2f}")
+                        with span('render.monthly_chart'):
+                            st.plotly_chart(monthly['figure'], use_container_width=True, config={"displayModeBar": False})
                  
                     
                    
+                    else:
+                        st.info("No expense data available for the current month")
+
+                    # Spending over the whole history, bucketed or downsampled to a fixed number of points
+                    st.subheader("Spending Trend")
+                    granularity = st.radio(
+                        "Granularity", ['auto', 'day', 'week', 'month', 'quarter'],
+                        format_func=str.capitalize, horizontal=True, key='trend_granularity'
+                    )
+                    trend_figure = snapshot.view_data(
+                        ('trend', granularity, TREND_MAX_POINTS),
+                        lambda: spending_trend_figure(snapshot, granularity)
+                    )
+                    with span('render.trend_chart'):
+                        st.plotly_chart(trend_figure, use_container_width=True, config={"displayModeBar": False})
                 else:
-                    st.info("No expense data available for the current month")
-            else:
-                st.info("No transaction data available")
-        except Exception as e:
-            st.error(f"Error in Monthly Expenses view: {str(e)}")
-            import traceback
-            st.code(traceback.format_exc())
+                    st.info("No transaction data available")
+            except Exception as e:
+                st.error(f"Error in Monthly Expenses view: {str(e)}")
+                import traceback
+                st.code(traceback.format_exc())
 
 if 'selected_day' not in st.session_state:
     st.session_state['selected_day'] = week_days[today.weekday()]
@@ -350,4 +310,8 @@ selected_day_label = st.session_state['selected_day']
 selected_day_index = week_days.index(selected_day_label)
 selected_date = week_dates[selected_day_index]
 
+# Open the app with ?debug=1 to see the data, cache, client metrics and stage timings
+if st.query_params.get('debug') == '1':
+    up_api_service.debug_up_api_service(snapshot)
+
 
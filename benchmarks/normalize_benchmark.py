@@ -0,0 +1,122 @@
+'''
+Benchmark the columnar transaction normalizer against the original per-row loop,
+and report the memory footprint of the compact schema against the original one
+
+Run from the repository root:
+    python benchmarks/normalize_benchmark.py [rows]
+'''
+
+import os
+import sys
+import time
+from copy import deepcopy
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mock_data import transactions_data, categories_data
+from up_api_service import normalize_transactions
+
+PAGE_SIZE = 100
+
+def make_transactions(rows):
+    """Repeat the mock transactions with unique ids and spread-out timestamps"""
+    templates = transactions_data['data']
+    start = datetime(2020, 1, 1)
+    transactions = []
+    for i in range(rows):
+        transaction = deepcopy(templates[i % len(templates)])
+        timestamp = (start + timedelta(minutes=37 * i)).strftime("%Y-%m-%dT%H:%M:%S+11:00")
+        transaction['id'] = f"tx-{i}"
+        transaction['attributes']['createdAt'] = timestamp
+        transaction['attributes']['settledAt'] = timestamp
+        transactions.append(transaction)
+    return transactions
+
+def normalize_transactions_rowwise(transactions, categories):
+    """The original per-transaction normalization loop, kept as the reference"""
+    category_lookup = {}
+    for category in categories['data']:
+        category_lookup[category['id']] = category['attributes']['name']
+    
+    formatted_data = []
+    for transaction in transactions['data']:
+        if transaction['relationships']['category']['data'] and transaction['relationships']['category']['data']['id'] == 'transfer':
+            continue
+        category_id = None
+        if transaction['relationships']['category']['data']:
+            category_id = transaction['relationships']['category']['data']['id']
+        category_name = category_lookup.get(category_id, 'Uncategorized') if category_id else 'Uncategorized'
+        settled_at = transaction['attributes'].get('settledAt')
+        created_at = transaction['attributes'].get('createdAt')
+        date_value = settled_at or created_at or None
+        transaction_data = {
+            'date': pd.to_datetime(date_value, utc=True) if date_value else None,
+            'description': transaction['attributes']['description'],
+            'amount': float(transaction['attributes']['amount']['value']),
+            'category': category_name,
+            'account_id': transaction['relationships']['account']['data']['id'],
+            'raw_text': transaction['attributes'].get('rawText', ''),
+            'tags': [tag['id'] for tag in transaction['relationships'].get('tags', {}).get('data', [])] if 'tags' in transaction['relationships'] else [],
+            'transactionType': transaction['attributes'].get('transactionType', '')
+        }
+        if 'message' in transaction['attributes'] and transaction['attributes']['message']:
+            transaction_data['message'] = transaction['attributes']['message']
+        formatted_data.append(transaction_data)
+    
+    df = pd.DataFrame(formatted_data)
+    if not df.empty:
+        df['date'] = pd.to_datetime(df['date'])
+        df['month'] = df['date'].dt.strftime('%Y-%m')
+    return df
+
+def check_matches(df, tags_df, expected):
+    """Check the compact frames hold the same data as the original row-wise frame"""
+    pd.testing.assert_series_equal(df['date'], expected['date'])
+    pd.testing.assert_series_equal(df['amount_cents'] / 100, expected['amount'], check_names=False)
+    for column in ['category', 'account_id', 'transactionType', 'month']:
+        pd.testing.assert_series_equal(df[column].astype(object), expected[column].astype(object))
+    expected_tags = expected.assign(transaction_id=df['id']).explode('tags').dropna(subset=['tags'])
+    assert list(tags_df['transaction_id']) == list(expected_tags['transaction_id'])
+    assert list(tags_df['tag'].astype(object)) == list(expected_tags['tags'])
+
+def memory_report(df, tags_df, expected, rows):
+    """Print deep memory usage per column, scaled to 100k rows"""
+    scale = 100_000 / rows
+    legacy = expected.memory_usage(deep=True, index=False) * scale
+    compact = df.memory_usage(deep=True, index=False) * scale
+    tags = tags_df.memory_usage(deep=True, index=False).sum() * scale
+    print("memory per 100k rows (MB):")
+    print(f"  {'column':<16}{'original':>10}{'compact':>10}")
+    for column in sorted(set(legacy.index) | set(compact.index)):
+        before = legacy.get(column, 0) / 1e6
+        after = compact.get(column, 0) / 1e6
+        print(f"  {column:<16}{before:>10.2f}{after:>10.2f}")
+    print(f"  {'tags table':<16}{'':>10}{tags / 1e6:>10.2f}")
+    total_before = legacy.sum() / 1e6
+    total_after = (compact.sum() + tags) / 1e6
+    print(f"  {'total':<16}{total_before:>10.2f}{total_after:>10.2f}  ({total_before / total_after:.1f}x smaller)")
+
+def main(rows=100_000):
+    transactions = make_transactions(rows)
+    pages = [transactions[i:i + PAGE_SIZE] for i in range(0, rows, PAGE_SIZE)]
+
+    start = time.perf_counter()
+    expected = normalize_transactions_rowwise({'data': transactions}, categories_data)
+    rowwise_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    df, tags_df = normalize_transactions(pages, categories_data, tz='UTC')
+    columnar_seconds = time.perf_counter() - start
+
+    check_matches(df, tags_df, expected)
+    print(f"rows:      {rows}")
+    print(f"row-wise:  {rowwise_seconds:.3f}s")
+    print(f"columnar:  {columnar_seconds:.3f}s")
+    print(f"speedup:   {rowwise_seconds / columnar_seconds:.1f}x")
+    memory_report(df, tags_df, expected, rows)
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
@@ -0,0 +1,182 @@
+'''
+Benchmark the data pipeline, the aggregate functions and the dashboard views of dashboard_views.py
+at several sizes, and compare wall time and peak memory against a stored baseline
+
+Run from the repository root:
+    python benchmarks/pipeline_benchmark.py [--sizes 1000,100000,1000000] [--save-baseline]
+
+Exits with status 1 on a regression. Timings depend on the machine, so save a
+fresh baseline (benchmarks/baseline.json) before comparing on new hardware.
+
+Peak memory is reported twice: tracemalloc sees Python and NumPy allocations
+but not Arrow buffers, which come from Arrow's memory pool and are counted
+separately. Memory-mapped store files are not allocations and count in
+neither.
+'''
+
+import argparse
+import gc
+import json
+import os
+import sys
+import time
+import tracemalloc
+from datetime import timedelta
+
+import pyarrow as pa
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from aggregate_cube import AggregateCube
+from dashboard_views import daily_view_data, monthly_view_data, spending_trend_figure, weekly_view_data
+from mock_data import categories_data, generate_accounts_data, generate_transaction_pages
+from time_index import TimeIndex
+from transaction_store import DEFAULT_TIMEZONE, cube_frame, frames_from_table, resources_to_table
+from up_api_service import (
+    TransactionSnapshot,
+    format_transactions_for_dashboard,
+    get_estimated_annual_income,
+    get_monthly_expenses_by_category,
+    get_monthly_income,
+    get_monthly_spending_trends,
+    get_spending_trend
+)
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+DEFAULT_SIZES = [1_000, 100_000, 1_000_000]
+# Slower or bigger than the baseline by more than this share counts as a regression
+TOLERANCE = 0.25
+# Timings below this many seconds are too noisy to compare
+MIN_SECONDS = 0.005
+REPEATS = 5
+
+def build_snapshot(table, accounts):
+    """The snapshot app.py renders from, built from a raw transactions table"""
+    df, tags_df = frames_from_table(table, categories_data, DEFAULT_TIMEZONE)
+    cube = AggregateCube.from_frame(cube_frame(table, DEFAULT_TIMEZONE), DEFAULT_TIMEZONE)
+    return TransactionSnapshot(accounts, categories_data, df, tags_df, cube, DEFAULT_TIMEZONE)
+
+def cases(pages, table, accounts):
+    """
+    (name, callable) pairs to measure; the snapshot is built once for the ones
+    that read it. `pages()` yields the raw pages `table` was built from; they
+    are generated as they are parsed, as a crawl streams them in, so
+    resources_to_table includes generating them.
+    """
+    snapshot = build_snapshot(table, accounts)
+    today = snapshot.now()
+    # The views as app.py shows them first: today, this week and this month, uncached
+    week_start = today.date() - timedelta(days=today.weekday())
+    return [
+        ('resources_to_table', lambda: resources_to_table(pages())),
+        ('format_transactions_for_dashboard', lambda: format_transactions_for_dashboard(build_snapshot(table, accounts))),
+        ('time_index', lambda: TimeIndex(snapshot.transactions_df)),
+        ('get_monthly_income', lambda: get_monthly_income(snapshot)),
+        ('get_estimated_annual_income', lambda: get_estimated_annual_income(snapshot)),
+        ('get_monthly_expenses_by_category', lambda: get_monthly_expenses_by_category(snapshot)),
+        ('get_monthly_spending_trends', lambda: get_monthly_spending_trends(snapshot)),
+        ('get_spending_trend_day', lambda: get_spending_trend(snapshot, 'day')),
+        ('get_spending_trend_auto', lambda: get_spending_trend(snapshot, 'auto', by_category=True)),
+        ('daily_view_data', lambda: daily_view_data(snapshot, today.date())),
+        ('weekly_view_data', lambda: weekly_view_data(snapshot, week_start)),
+        ('monthly_view_data', lambda: monthly_view_data(snapshot)),
+        ('spending_trend_figure_day', lambda: spending_trend_figure(snapshot, 'day')),
+        ('spending_trend_figure_auto', lambda: spending_trend_figure(snapshot, 'auto'))
+    ]
+
+def measure(function, repeats=REPEATS):
+    """
+    Best wall time in seconds over `repeats` runs, and the peak traced and
+    peak Arrow memory in MB of one more run
+    """
+    seconds = float('inf')
+    for _ in range(repeats):
+        gc.collect()
+        start = time.perf_counter()
+        function()
+        seconds = min(seconds, time.perf_counter() - start)
+    gc.collect()
+    # A proxy pool tracks the peak of what Arrow allocates during this run only
+    default_pool = pa.default_memory_pool()
+    arrow_pool = pa.proxy_memory_pool(default_pool)
+    pa.set_memory_pool(arrow_pool)
+    tracemalloc.start()
+    try:
+        function()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+        pa.set_memory_pool(default_pool)
+    return seconds, peak / 1e6, arrow_pool.max_memory() / 1e6
+
+def run(sizes):
+    """Results as {size: {case: {'seconds': ..., 'peak_mb': ..., 'arrow_peak_mb': ...}}}"""
+    results = {}
+    for size in sizes:
+        accounts = generate_accounts_data(accounts=3)
+        pages = lambda: generate_transaction_pages(count=size, accounts=3)
+        table = resources_to_table(pages())
+        repeats = REPEATS if size < 1_000_000 else 2
+        results[str(size)] = {}
+        for name, function in cases(pages, table, accounts):
+            seconds, peak_mb, arrow_peak_mb = measure(function, repeats)
+            results[str(size)][name] = {
+                'seconds': round(seconds, 6),
+                'peak_mb': round(peak_mb, 3),
+                'arrow_peak_mb': round(arrow_peak_mb, 3)
+            }
+            print(f"{size:>9} {name:<36}{seconds * 1000:>10.2f} ms{peak_mb:>10.2f} MB{arrow_peak_mb:>10.2f} MB arrow", flush=True)
+    return results
+
+def compare(results, baseline, tolerance=TOLERANCE):
+    """Print each measurement against the baseline, returning the regressions found"""
+    regressions = []
+    print(f"\n{'size':>9} {'case':<36}{'time':>10}{'memory':>10}{'arrow':>10}  (vs baseline)")
+    for size, measurements in results.items():
+        for name, result in measurements.items():
+            base = baseline.get(size, {}).get(name)
+            if base is None:
+                print(f"{size:>9} {name:<36}{'new':>10}{'new':>10}{'new':>10}")
+                continue
+            time_change = result['seconds'] / base['seconds'] - 1 if base['seconds'] else 0.0
+            memory_change = result['peak_mb'] / base['peak_mb'] - 1 if base['peak_mb'] else 0.0
+            # Baselines saved before Arrow memory was measured have no arrow_peak_mb
+            base_arrow = base.get('arrow_peak_mb')
+            arrow_change = result['arrow_peak_mb'] / base_arrow - 1 if base_arrow else 0.0
+            flags = []
+            if time_change > tolerance and result['seconds'] > MIN_SECONDS:
+                flags.append('time')
+            if memory_change > tolerance and result['peak_mb'] > 1:
+                flags.append('memory')
+            if arrow_change > tolerance and result['arrow_peak_mb'] > 1:
+                flags.append('arrow memory')
+            if flags:
+                regressions.append((size, name, flags))
+            print(f"{size:>9} {name:<36}{time_change:>+10.0%}{memory_change:>+10.0%}{arrow_change:>+10.0%}  {'REGRESSION' if flags else ''}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', default=','.join(str(size) for size in DEFAULT_SIZES))
+    parser.add_argument('--save-baseline', action='store_true', help="store these results as the new baseline")
+    parser.add_argument('--tolerance', type=float, default=TOLERANCE)
+    args = parser.parse_args()
+
+    results = run([int(size) for size in args.sizes.split(',')])
+    if args.save_baseline:
+        with open(BASELINE_PATH, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"\nBaseline saved to {BASELINE_PATH}")
+        return
+    if not os.path.exists(BASELINE_PATH):
+        print("\nNo baseline yet; run with --save-baseline to store one")
+        return
+    with open(BASELINE_PATH, 'r') as f:
+        baseline = json.load(f)
+    regressions = compare(results, baseline, args.tolerance)
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) beyond {args.tolerance:.0%}")
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
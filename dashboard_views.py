@@ -0,0 +1,139 @@
+'''
+Data and Plotly figures behind each dashboard view, computed from a snapshot so they can be cached and benchmarked
+'''
+
+import calendar
+
+import pandas as pd
+import plotly.express as px
+
+from up_api_service import TREND_MAX_POINTS, get_monthly_expenses_by_category, get_spending_trend
+
+def daily_view_data(snapshot, selected_date):
+    """The selected day's transactions (excluding transfers and round ups) and their total"""
+    # Filter transactions for the selected day, excluding 'Transfer' and 'Round Up'
+    selected_date_df = snapshot.time_index().day(selected_date)
+    selected_date_df = selected_date_df[~selected_date_df['transactionType'].isin(['Transfer', 'Round Up'])]
+    return {
+        'selected_date_df': selected_date_df,
+        'day_total': selected_date_df['amount_cents'].sum() / 100
+    }
+
+def weekly_figure(daily_category_spend, daily_totals):
+    """Stacked bar chart of the week's spend per day and category, with each day's total on top"""
+    # Create a stacked bar chart showing daily spending by category
+    fig = px.bar(
+        daily_category_spend,
+        x='day',
+        y='amount',
+        color='category',
+        title='Expenses by Day',
+        labels={'day': 'Date', 'amount': 'Amount ($)', 'category': 'Category'},
+        color_discrete_sequence=px.colors.qualitative.Prism,
+        text='category',  # Show category names in the bars
+        barmode='stack'    # Ensure bars are stacked
+    )
+
+    # Add total amount spent for each day on top of the chart
+    for i, row in daily_totals.iterrows():
+        fig.add_annotation(
+            x=row['day'],
+            y=row['amount'],
+            text=row['total_text'],
+            showarrow=False,
+            yshift=10
+        )
+
+    # Customize the layout for a cleaner look
+    fig.update_layout(
+        margin=dict(t=40, b=0, l=0, r=0),
+        legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1),
+        xaxis=dict(title="Day of Week", tickformat="%a, %b %d"),
+        yaxis=dict(title="Amount ($)"),
+        plot_bgcolor='#1E1E1E',
+        bargap=0.2
+    )
+
+    # Hide category text inside small bars
+    fig.update_traces(textposition='none')
+    return fig
+
+def weekly_view_data(snapshot, week_start):
+    """Spend per day and category for the week starting at week_start, or None if there was none"""
+    # Slice the week out of the local-day index instead of converting every row
+    weekly_expenses = snapshot.time_index().week(week_start)
+    weekly_expenses = weekly_expenses[~weekly_expenses['transactionType'].isin(['Transfer', 'Round Up'])].copy()
+    if weekly_expenses.empty:
+        return None
+
+    # Add a day column for grouping
+    weekly_expenses['day'] = weekly_expenses['local_date'].dt.date
+    weekly_expenses['day_name'] = weekly_expenses['weekday'].map(dict(enumerate(calendar.day_abbr)))
+
+    # Before grouping for the chart, filter for expenses only
+    weekly_expenses_expense_only = weekly_expenses[weekly_expenses['amount_cents'] < 0]
+    daily_category_spend = weekly_expenses_expense_only.groupby(['day', 'day_name', 'category'], observed=True)['amount_cents'].sum().reset_index()
+    daily_category_spend['amount'] = daily_category_spend['amount_cents'].abs() / 100  # Ensure all amounts are positive dollars
+
+    # Calculate total amount spent for each day
+    daily_totals = daily_category_spend.groupby('day')['amount'].sum().reset_index()
+    daily_totals['total_text'] = daily_totals['amount'].apply(lambda x: f"${x:.2f}")
+    return {
+        'daily_category_spend': daily_category_spend,
+        'figure': weekly_figure(daily_category_spend, daily_totals),
+        'weekly_total': weekly_expenses_expense_only['amount_cents'].abs().sum() / 100
+    }
+
+def monthly_figure(category_data):
+    """Donut chart of the month's spend per category"""
+    # Create pie chart
+    fig = px.pie(
+        category_data, 
+        values='Amount ($)', 
+        names='Category',
+        title='Monthly Spending by Category',
+        color_discrete_sequence=px.colors.qualitative.Pastel,
+        hole=0.4
+    )
+    fig.update_layout(margin=dict(t=40, b=0, l=0, r=0))
+    return fig
+
+def monthly_view_data(snapshot):
+    """This month's spend per category with percentages, or None if there was none"""
+    category_expenses = get_monthly_expenses_by_category(snapshot)
+    if not category_expenses:
+        return None
+
+    # Create dataframe for visualization
+    category_data = pd.DataFrame({
+        'category': list(category_expenses.keys()),
+        'amount': list(category_expenses.values())
+    })
+    category_data = category_data.sort_values('amount', ascending=False)
+    total_expenses = category_data['amount'].sum()
+    category_data['percentage'] = (category_data['amount'] / total_expenses * 100).round(1)
+    category_data = category_data.rename(columns={'amount': 'Amount ($)', 'category': 'Category', 'percentage': 'Percentage (%)'})
+    return {'figure': monthly_figure(category_data), 'total_expenses': total_expenses}
+
+def spending_trend_figure(snapshot, granularity):
+    """Line chart of daily spending (downsampled) or stacked bars of spending per period and category"""
+    if granularity == 'day':
+        trend = get_spending_trend(snapshot, granularity, TREND_MAX_POINTS)
+        fig = px.line(trend, x='period', y='amount', title='Daily Spending',
+                      labels={'period': 'Date', 'amount': 'Amount ($)'})
+    else:
+        trend = get_spending_trend(snapshot, granularity, TREND_MAX_POINTS, by_category=True)
+        fig = px.bar(
+            trend,
+            x='period',
+            y='amount',
+            color='category',
+            title='Spending by Period',
+            labels={'period': 'Period', 'amount': 'Amount ($)', 'category': 'Category'},
+            color_discrete_sequence=px.colors.qualitative.Prism
+        )
+    fig.update_layout(
+        margin=dict(t=40, b=0, l=0, r=0),
+        legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1)
+    )
+    return fig
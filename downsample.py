@@ -0,0 +1,65 @@
+'''
+Reduce long time series to a point budget for charting: LTTB for line series, calendar buckets for bars
+'''
+
+import numpy as np
+import pandas as pd
+
+# Bucket sizes from finest to coarsest, as pandas period frequencies (weeks start on Monday)
+BUCKET_FREQUENCIES = {
+    'day': 'D',
+    'week': 'W-SUN',
+    'month': 'M',
+    'quarter': 'Q',
+    'year': 'Y'
+}
+
+def lttb(x, y, threshold):
+    """
+    Indices of the `threshold` points Largest-Triangle-Three-Buckets keeps
+    to draw y over x (both sorted by x). The first and last points are
+    always kept; each bucket in between keeps the point forming the largest
+    triangle with the previous kept point and the next bucket's average.
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+
+    # threshold - 2 buckets over the points between the first and the last
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    keep = np.empty(threshold, dtype=np.int64)
+    keep[0], keep[-1] = 0, n - 1
+    previous = 0
+    for i in range(threshold - 2):
+        start, stop = edges[i], edges[i + 1]
+        if i < threshold - 3:
+            next_x = x[stop:edges[i + 2]].mean()
+            next_y = y[stop:edges[i + 2]].mean()
+        else:
+            next_x, next_y = x[-1], y[-1]
+        areas = np.abs(
+            (x[previous] - next_x) * (y[start:stop] - y[previous])
+            - (x[previous] - x[start:stop]) * (next_y - y[previous])
+        )
+        previous = start + int(np.argmax(areas))
+        keep[i + 1] = previous
+    return keep
+
+def bucket_count(start, end, frequency):
+    """Number of `frequency` buckets (a key of BUCKET_FREQUENCIES) covering start to end"""
+    freq = BUCKET_FREQUENCIES[frequency]
+    return pd.Period(end, freq).ordinal - pd.Period(start, freq).ordinal + 1
+
+def bucket_frequency(start, end, max_points, finest='day'):
+    """The finest frequency, no finer than `finest`, with at most max_points buckets from start to end"""
+    names = list(BUCKET_FREQUENCIES)
+    for frequency in names[names.index(finest):]:
+        if bucket_count(start, end, frequency) <= max_points:
+            return frequency
+    return names[-1]
+
+def bucket_starts(dates, frequency):
+    """Start of the bucket each (naive) date falls in"""
+    return pd.DatetimeIndex(dates).to_period(BUCKET_FREQUENCIES[frequency]).start_time
@@ -1,3 +1,5 @@
+import numpy as np
+
 def calculate_spending_limits(income):
     """
     Calculate recommended spending limits based on established financial guidelines.
@@ -62,6 +64,30 @@ def calculate_spending_limits(income):
         'Other': income * 0.05  # Buffer for miscellaneous expenses
     }
 
+# Financial health descriptions, indexed by the codes get_financial_health_scores returns
+HEALTH_DESCRIPTIONS = [
+    "Please enter your income for a financial health assessment",
+    "Needs improvement",
+    "Fair financial health",
+    "Good financial health",
+    "Excellent financial health"
+]
+
+NO_INCOME_ADVICE = "Please enter your income to receive personalized advice"
+OVER_INCOME_ADVICE = "Your expenses exceed your income. Look for ways to reduce spending or increase income."
+SAVE_10_ADVICE = "Try to save at least 10% of your income for emergencies and future goals."
+SAVE_20_ADVICE = "Consider increasing your savings rate to 20% for long-term financial security."
+ON_TRACK_ADVICE = "Your spending patterns align well with financial recommendations. Keep up the good work!"
+
+# Bits of the masks get_spending_advice_masks returns. Each category in calculate_spending_limits
+# order then gets two bits from ADVICE_CATEGORY_SHIFT: significantly over, then slightly over.
+ADVICE_NO_INCOME = 1 << 0
+ADVICE_OVER_INCOME = 1 << 1
+ADVICE_SAVE_10 = 1 << 2
+ADVICE_SAVE_20 = 1 << 3
+ADVICE_ON_TRACK = 1 << 4
+ADVICE_CATEGORY_SHIFT = 5
+
 def get_financial_health_score(income, expenses):
     """
     Calculate a financial health score based on spending patterns.
@@ -75,7 +101,7 @@ def get_financial_health_score(income, expenses):
     str: Description of financial health
     """
     if income <= 0:
-        return 0, "Please enter your income for a financial health assessment"
+        return 0, HEALTH_DESCRIPTIONS[0]
     
     # Calculate recommended limits
     limits = calculate_spending_limits(income)
@@ -106,13 +132,13 @@ def get_financial_health_score(income, expenses):
     
     # Determine financial health category
     if score >= 80:
-        description = "Excellent financial health"
+        description = HEALTH_DESCRIPTIONS[4]
     elif score >= 60:
-        description = "Good financial health"
+        description = HEALTH_DESCRIPTIONS[3]
     elif score >= 40:
-        description = "Fair financial health"
+        description = HEALTH_DESCRIPTIONS[2]
     else:
-        description = "Needs improvement"
+        description = HEALTH_DESCRIPTIONS[1]
     
     return score, description
 
@@ -130,7 +156,7 @@ def get_spending_advice(income, expenses):
     advice = []
     
     if income <= 0:
-        return ["Please enter your income to receive personalized advice"]
+        return [NO_INCOME_ADVICE]
     
     # Calculate recommended limits
     limits = calculate_spending_limits(income)
@@ -140,25 +166,123 @@ def get_spending_advice(income, expenses):
     
     # Check if total expenses exceed income
     if total_expenses > income:
-        advice.append("Your expenses exceed your income. Look for ways to reduce spending or increase income.")
+        advice.append(OVER_INCOME_ADVICE)
     
     # Check individual categories
     for category, limit in limits.items():
         if category in expenses:
             if expenses[category] > limit * 1.2:  # 20% over limit
-                advice.append(f"Your {category.lower()} expenses are significantly over the recommended limit. Consider reducing spending in this area.")
+                advice.append(_significantly_over_advice(category))
             elif expenses[category] > limit:
-                advice.append(f"Your {category.lower()} expenses are slightly over the recommended limit.")
+                advice.append(_slightly_over_advice(category))
     
     # Check savings rate
     savings_rate = (income - total_expenses) / income if income > 0 else 0
     if savings_rate < 0.1:  # Less than 10% savings
-        advice.append("Try to save at least 10% of your income for emergencies and future goals.")
+        advice.append(SAVE_10_ADVICE)
     elif savings_rate < 0.2:  # Less than 20% savings
-        advice.append("Consider increasing your savings rate to 20% for long-term financial security.")
+        advice.append(SAVE_20_ADVICE)
     
     # If no specific issues, give general advice
     if not advice:
-        advice.append("Your spending patterns align well with financial recommendations. Keep up the good work!")
+        advice.append(ON_TRACK_ADVICE)
     
     return advice
+
+def _significantly_over_advice(category):
+    return f"Your {category.lower()} expenses are significantly over the recommended limit. Consider reducing spending in this area."
+
+def _slightly_over_advice(category):
+    return f"Your {category.lower()} expenses are slightly over the recommended limit."
+
+def _batch_inputs(income, expenses, categories):
+    """Income as a float vector, the row totals summed in column order, and (category, limit, column) per limit"""
+    income = np.asarray(income, dtype=np.float64)
+    expenses = np.asarray(expenses, dtype=np.float64).reshape(len(income), len(categories))
+    # Add the columns one at a time, in the same order as sum() over the dict, so totals match to the bit
+    total_expenses = np.zeros(len(income))
+    for column in range(len(categories)):
+        total_expenses = total_expenses + expenses[:, column]
+    columns = {category: column for column, category in enumerate(categories)}
+    limits = [
+        (category, limit, expenses[:, columns[category]])
+        for category, limit in calculate_spending_limits(income).items()
+        if category in columns
+    ]
+    return income, total_expenses, limits
+
+def get_financial_health_scores(income, expenses, categories):
+    """
+    Vectorized get_financial_health_score for many months (or users) at once.
+
+    Parameters:
+    income (array-like): Monthly income, shape (n,)
+    expenses (array-like): Expenses, shape (n, len(categories)); use 0 for categories without expenses
+    categories (list): Category name of each expenses column, in the order the dicts would list them
+
+    Returns:
+    ndarray: Financial health scores (0-100), shape (n,)
+    ndarray: Description codes indexing HEALTH_DESCRIPTIONS, shape (n,)
+    """
+    income, total_expenses, limits = _batch_inputs(income, expenses, categories)
+    has_income = income > 0
+    with np.errstate(divide='ignore', invalid='ignore'):
+        score = np.full(len(income), 100.0)
+        score -= np.where(total_expenses > income, 30, 0)
+        for _, limit, spent in limits:
+            overage_percent = (spent - limit) / limit
+            score -= np.where(spent > limit, np.minimum(15, overage_percent * 100), 0)
+        savings_rate = (income - total_expenses) / income
+    score -= np.where(savings_rate < 0.1, 20, 0)
+    score = np.clip(score, 0, 100)
+    score[~has_income] = 0
+
+    codes = np.select([score >= 80, score >= 60, score >= 40], [4, 3, 2], 1).astype(np.int8)
+    codes[~has_income] = 0
+    return score, codes
+
+def get_spending_advice_masks(income, expenses, categories):
+    """
+    Vectorized get_spending_advice for many months (or users) at once,
+    taking the same arguments as get_financial_health_scores.
+
+    Returns:
+    ndarray: Advice bitmasks (ADVICE_* bits), shape (n,); decode one with advice_from_mask()
+    """
+    income, total_expenses, limits = _batch_inputs(income, expenses, categories)
+    has_income = income > 0
+    masks = np.where(total_expenses > income, ADVICE_OVER_INCOME, 0).astype(np.int64)
+    category_bits = {category: ADVICE_CATEGORY_SHIFT + 2 * i for i, category in enumerate(calculate_spending_limits(1.0))}
+    for category, limit, spent in limits:
+        bit = category_bits[category]
+        significantly_over = spent > limit * 1.2
+        masks |= np.where(significantly_over, 1 << bit, 0)
+        masks |= np.where(~significantly_over & (spent > limit), 1 << (bit + 1), 0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        savings_rate = (income - total_expenses) / income
+    masks |= np.where(savings_rate < 0.1, ADVICE_SAVE_10, np.where(savings_rate < 0.2, ADVICE_SAVE_20, 0))
+    masks |= np.where(masks == 0, ADVICE_ON_TRACK, 0)
+    masks[~has_income] = ADVICE_NO_INCOME
+    return masks
+
+def advice_from_mask(mask):
+    """The advice list get_spending_advice gives for one bitmask from get_spending_advice_masks"""
+    mask = int(mask)
+    if mask & ADVICE_NO_INCOME:
+        return [NO_INCOME_ADVICE]
+    advice = []
+    if mask & ADVICE_OVER_INCOME:
+        advice.append(OVER_INCOME_ADVICE)
+    for i, category in enumerate(calculate_spending_limits(1.0)):
+        bit = ADVICE_CATEGORY_SHIFT + 2 * i
+        if mask & (1 << bit):
+            advice.append(_significantly_over_advice(category))
+        elif mask & (1 << (bit + 1)):
+            advice.append(_slightly_over_advice(category))
+    if mask & ADVICE_SAVE_10:
+        advice.append(SAVE_10_ADVICE)
+    elif mask & ADVICE_SAVE_20:
+        advice.append(SAVE_20_ADVICE)
+    if mask & ADVICE_ON_TRACK:
+        advice.append(ON_TRACK_ADVICE)
+    return advice
@@ -2,7 +2,11 @@
 Mock data following the Up Banking API format
 '''
 
+import itertools
+import random
+import uuid
 from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
 
 accounts_data = {
     "data": [
@@ -529,3 +533,189 @@ def get_transactions_data():
 def get_categories_data():
     """Return mock categories data"""
     return categories_data
+
+# Secret key of the mock webhook, used to sign the recorded events below
+webhook_secret_key = "mock-webhook-secret"
+
+def _webhook_event(event_id, event_type, transaction_id=None):
+    """A webhook event body in the format Up POSTs to a webhook URL"""
+    relationships = {
+        "webhook": {
+            "data": { "type": "webhooks", "id": "webhook-001" },
+            "links": { "related": "https://api.up.com.au/api/v1/webhooks/webhook-001" }
+        }
+    }
+    if transaction_id:
+        relationships["transaction"] = { "data": { "type": "transactions", "id": transaction_id }}
+        if event_type != "TRANSACTION_DELETED":
+            relationships["transaction"]["links"] = {
+                "related": f"https://api.up.com.au/api/v1/transactions/{transaction_id}"
+            }
+    return {
+        "data": {
+            "type": "webhook-events",
+            "id": event_id,
+            "attributes": {
+                "eventType": event_type,
+                "createdAt": datetime.now().strftime("%Y-%m-%dT%H:%M:%S+11:00")
+            },
+            "relationships": relationships
+        }
+    }
+
+def get_webhook_events_data():
+    """Return recorded webhook events touching the mock transactions"""
+    return [
+        _webhook_event("event-001", "PING"),
+        _webhook_event("event-002", "TRANSACTION_CREATED", "tx-current-1"),
+        _webhook_event("event-003", "TRANSACTION_SETTLED", "tx-current-2"),
+        _webhook_event("event-004", "TRANSACTION_DELETED", "tx-003")
+    ]
+
+# Offset the synthetic timestamps are written in, as the Up API does
+GENERATOR_TIMEZONE = ZoneInfo("Australia/Melbourne")
+
+# Synthetic data generator: category id -> (relative frequency, min cents, max cents, merchants, tags)
+DEFAULT_CATEGORY_MIX = {
+    "groceries": (30, 800, 18000, ["Coles Supermarket", "Woolworths", "Aldi", "IGA"], ["weekly", "food"]),
+    "dining": (25, 450, 9500, ["Cafe Rio", "Sushi Train", "Grill'd", "Local Bakery"], ["coffee", "lunch", "social"]),
+    "transportation": (15, 300, 9000, ["Shell", "Opal Top Up", "Uber", "BP"], ["travel", "car", "transport"]),
+    "entertainment": (10, 999, 6500, ["Netflix", "Spotify", "Event Cinemas", "Steam"], ["subscription", "movie"]),
+    "utilities": (8, 4500, 32000, ["AGL Energy", "Telstra", "Sydney Water"], ["bills", "monthly"]),
+    "housing": (4, 120000, 260000, ["Rent Payment"], ["monthly"]),
+    None: (8, 200, 15000, ["Kmart", "Bunnings", "JB Hi-Fi", "Chemist Warehouse"], [])
+}
+
+def _uuid(rng):
+    """A deterministic UUID4 string from the generator's random state"""
+    return str(uuid.UUID(int=rng.getrandbits(128), version=4))
+
+def _amount(cents):
+    return {"currencyCode": "AUD", "value": f"{cents / 100:.2f}", "valueInBaseUnits": cents}
+
+def _timestamp(seconds):
+    return datetime.fromtimestamp(seconds, GENERATOR_TIMEZONE).isoformat(timespec='seconds')
+
+def generate_accounts_data(accounts=2, seed=0, days=365, end=None):
+    """
+    Return `accounts` synthetic accounts in the Up API format.
+
+    Every third account (starting with the first) is TRANSACTIONAL and the
+    rest are SAVER accounts. Accounts were created `days` before `end`.
+    """
+    rng = random.Random(f"accounts-{seed}")
+    end = (end or datetime.now(GENERATOR_TIMEZONE)).timestamp()
+    data = []
+    for index in range(accounts):
+        transactional = index % 3 == 0
+        data.append({
+            "type": "accounts",
+            "id": f"acct-{index + 1:04d}",
+            "attributes": {
+                "displayName": f"{'Spending' if transactional else 'Saver'} {index + 1}",
+                "name": f"{'Spending' if transactional else 'Saver'} {index + 1}",
+                "balance": _amount(rng.randint(0, 2_000_000)),
+                "accountType": "TRANSACTIONAL" if transactional else "SAVER",
+                "createdAt": _timestamp(end - days * 86400)
+            }
+        })
+    return {"data": data}
+
+def generate_transactions(count=10_000, accounts=2, days=365, end=None, seed=0, category_mix=None,
+                          salary_every_days=14, salary_cents=350_000, transfer_rate=0.05,
+                          round_up_rate=0.3, tag_rate=0.25, held_days=2):
+    """
+    Yield `count` synthetic transactions in the Up API format, newest first.
+
+    The same arguments always produce the same transactions. Purchases are
+    spread evenly over the `days` before `end` and drawn from
+    `category_mix` (see DEFAULT_CATEGORY_MIX); a salary lands on the first
+    account every `salary_every_days`; `transfer_rate` of the purchases are
+    accompanied by a transfer between accounts and `round_up_rate` by a
+    round up into a saver, each with the matching credit in the saver, as
+    Up reports both sides of a transfer. Transactions created in the last `held_days`
+    are HELD with no settledAt. Nothing is kept in memory between items,
+    so millions of transactions can be streamed.
+    """
+    rng = random.Random(seed)
+    mix = category_mix or DEFAULT_CATEGORY_MIX
+    categories = list(mix)
+    weights = [mix[category][0] for category in categories]
+    account_ids = [account["id"] for account in generate_accounts_data(accounts, seed, days, end)["data"]]
+    spending = account_ids[::3]
+    savers = [account_id for account_id in account_ids if account_id not in spending]
+
+    end = (end or datetime.now(GENERATOR_TIMEZONE)).timestamp()
+    start = end - days * 86400
+    # Round ups and transfers (two transactions each) ride along with purchases, so space purchases to still fill the span
+    per_purchase = 1 + (2 * (round_up_rate + transfer_rate) if savers else 0)
+    gap = (end - start) * per_purchase / max(count, 1)
+    held_since = end - held_days * 86400
+    salary_period = salary_every_days * 86400
+    next_salary = end - (end - start) % salary_period if salary_every_days else None
+
+    def transaction(created, account_id, description, cents, category, transaction_type, tags=(), raw_text=None):
+        held = created >= held_since
+        settled = None if held else min(end, created + rng.uniform(0, 2) * 86400)
+        return {
+            "type": "transactions",
+            "id": _uuid(rng),
+            "attributes": {
+                "status": "HELD" if held else "SETTLED",
+                "rawText": raw_text,
+                "description": description,
+                "message": None,
+                "amount": _amount(cents),
+                "transactionType": transaction_type,
+                "createdAt": _timestamp(created),
+                "settledAt": _timestamp(settled) if settled is not None else None
+            },
+            "relationships": {
+                "account": {"data": {"type": "accounts", "id": account_id}},
+                "category": {"data": {"type": "categories", "id": category} if category else None},
+                "tags": {"data": [{"type": "tags", "id": tag} for tag in tags]}
+            }
+        }
+
+    produced = 0
+    index = 0
+    while produced < count:
+        created = end - (index + rng.random()) * gap
+        index += 1
+        while next_salary is not None and next_salary > created and produced < count:
+            yield transaction(next_salary, account_ids[0], "Salary", salary_cents, "income", "Salary", ["salary"], "SALARY CREDIT")
+            produced += 1
+            next_salary -= salary_period
+        if produced == count:
+            return
+
+        category = rng.choices(categories, weights)[0]
+        _, low, high, merchants, category_tags = mix[category]
+        cents = -rng.randint(low, high)
+        merchant = rng.choice(merchants)
+        tags = rng.sample(category_tags, rng.randint(1, min(2, len(category_tags)))) if category_tags and rng.random() < tag_rate else []
+        account_id = rng.choice(spending)
+        yield transaction(created, account_id, merchant, cents, category, "Purchase", tags, merchant.upper())
+        produced += 1
+
+        if savers and produced + 2 <= count and rng.random() < round_up_rate and cents % 100:
+            # Up rounds the purchase up to the next dollar and moves the difference into a saver
+            round_up = 100 - (-cents) % 100
+            yield transaction(created, account_id, "Round Up", -round_up, None, "Round Up")
+            yield transaction(created, rng.choice(savers), "Round Up", round_up, None, "Round Up")
+            produced += 2
+        if savers and produced + 2 <= count and rng.random() < transfer_rate:
+            saver = rng.choice(savers)
+            cents = rng.randint(1000, 50000) // 100 * 100
+            yield transaction(created, account_id, f"Transfer to {saver}", -cents, "transfer", "Transfer")
+            yield transaction(created, saver, f"Transfer from {account_id}", cents, "transfer", "Transfer")
+            produced += 2
+
+def generate_transaction_pages(page_size=100, **kwargs):
+    """Yield generate_transactions(**kwargs) in pages (lists) of `page_size`, like the paginated API"""
+    transactions = generate_transactions(**kwargs)
+    while True:
+        page = list(itertools.islice(transactions, page_size))
+        if not page:
+            return
+        yield page
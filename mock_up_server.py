@@ -0,0 +1,176 @@
+'''
+Local stand-in for the Up Banking API, serving generated data for offline load and pagination testing
+
+Run from the repository root, then point the app at it:
+    python mock_up_server.py --transactions 100000 --latency 0.05 --rate-limit-rate 0.02
+    UP_API_BASE_URL=http://127.0.0.1:8600/api/v1 streamlit run app.py
+'''
+
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlencode, urlsplit
+
+import numpy as np
+
+from mock_data import categories_data, generate_accounts_data, generate_transactions
+from transaction_store import parse_timestamps
+
+API_PREFIX = '/api/v1'
+MOCK_SERVER_PORT = 8600
+# Up's default and maximum page sizes
+DEFAULT_PAGE_SIZE = 10
+MAX_PAGE_SIZE = 100
+
+class MockUpApi:
+    """
+    Generated accounts, categories and transactions plus the fault settings.
+
+    Every request waits up to `latency` seconds, then fails with a 429
+    (with Retry-After) with probability `rate_limit_rate` or with a 503 with
+    probability `error_rate`. If `token` is set, other bearer tokens get a 401.
+    """
+
+    def __init__(self, transactions=10_000, accounts=2, days=365, seed=0,
+                 latency=0.0, error_rate=0.0, rate_limit_rate=0.0, token=None):
+        self.accounts = generate_accounts_data(accounts, seed, days)
+        self.transactions = list(generate_transactions(count=transactions, accounts=accounts, days=days, seed=seed))
+        self.by_id = {transaction['id']: transaction for transaction in self.transactions}
+        # Negated createdAt in ns, ascending because the transactions are newest first
+        created = parse_timestamps([t['attributes']['createdAt'] for t in self.transactions]).asi8
+        everything = np.arange(len(self.transactions))
+        account_ids = np.array([t['relationships']['account']['data']['id'] for t in self.transactions], dtype=object)
+        self.listings = {None: (everything, -created)}
+        for account in self.accounts['data']:
+            positions = everything[account_ids == account['id']]
+            self.listings[account['id']] = (positions, -created[positions])
+
+        self.latency = latency
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.token = token
+        self.counters = {'requests': 0, 'rate_limited': 0, 'errors': 0}
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def fault(self):
+        """Status code of the simulated failure for the next request, or None"""
+        with self._lock:
+            self.counters['requests'] += 1
+            delay = self._rng.uniform(0, self.latency)
+            roll = self._rng.random()
+            status = None
+            if roll < self.rate_limit_rate:
+                status = 429
+                self.counters['rate_limited'] += 1
+            elif roll < self.rate_limit_rate + self.error_rate:
+                status = 503
+                self.counters['errors'] += 1
+        if delay:
+            time.sleep(delay)
+        return status
+
+    def list_transactions(self, account_id, params):
+        """One page of an account's (or all) transactions, newest first, honouring the filters and cursor"""
+        positions, negated = self.listings[account_id]
+        start, stop = 0, len(positions)
+        if 'filter[until]' in params:
+            start = np.searchsorted(negated, -_timestamp_ns(params['filter[until]']), 'right')
+        if 'filter[since]' in params:
+            stop = np.searchsorted(negated, -_timestamp_ns(params['filter[since]']), 'right')
+        size = min(int(params.get('page[size]', DEFAULT_PAGE_SIZE)), MAX_PAGE_SIZE)
+        offset = start + int(params.get('page[after]', 0))
+        end = min(offset + size, stop)
+        data = [self.transactions[position] for position in positions[offset:end]]
+        next_offset = end - start if end < stop else None
+        return data, next_offset
+
+def _timestamp_ns(value):
+    return int(parse_timestamps([value]).asi8[0])
+
+def make_handler(api):
+    """A request handler class serving `api`"""
+
+    class MockUpHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            status = api.fault()
+            if status == 429:
+                self.send_json(429, {'errors': [{'status': '429', 'title': 'Too Many Requests'}]}, {'Retry-After': '1'})
+                return
+            if status is not None:
+                self.send_json(status, {'errors': [{'status': str(status), 'title': 'Service Unavailable'}]})
+                return
+            if api.token and self.headers.get('Authorization') != f"Bearer {api.token}":
+                self.send_json(401, {'errors': [{'status': '401', 'title': 'Not Authorized'}]})
+                return
+
+            url = urlsplit(self.path)
+            params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+            parts = url.path[len(API_PREFIX):].strip('/').split('/') if url.path.startswith(API_PREFIX) else None
+            if parts == ['accounts']:
+                self.send_json(200, dict(api.accounts, links={'prev': None, 'next': None}))
+            elif parts == ['categories']:
+                self.send_json(200, categories_data)
+            elif parts == ['transactions'] or (parts and len(parts) == 3 and parts[0] == 'accounts' and parts[2] == 'transactions'):
+                account_id = parts[1] if len(parts) == 3 else None
+                if account_id not in api.listings:
+                    self.send_json(404, {'errors': [{'status': '404', 'title': 'Not Found'}]})
+                    return
+                data, next_offset = api.list_transactions(account_id, params)
+                next_url = None
+                if next_offset is not None:
+                    next_params = dict(params, **{'page[after]': next_offset})
+                    next_url = f"http://{self.headers.get('Host')}{url.path}?{urlencode(next_params)}"
+                self.send_json(200, {'data': data, 'links': {'prev': None, 'next': next_url}})
+            elif parts and len(parts) == 2 and parts[0] == 'transactions' and parts[1] in api.by_id:
+                self.send_json(200, {'data': api.by_id[parts[1]]})
+            else:
+                self.send_json(404, {'errors': [{'status': '404', 'title': 'Not Found'}]})
+
+        def send_json(self, status, body, headers=None):
+            payload = json.dumps(body).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(payload)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, format, *args):
+            # Load tests make thousands of requests; keep the console quiet
+            pass
+
+    return MockUpHandler
+
+def start_server(api, host='127.0.0.1', port=0):
+    """Serve `api` from a background thread, returning the server and its API base URL"""
+    server = ThreadingHTTPServer((host, port), make_handler(api))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}{API_PREFIX}"
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--port', type=int, default=MOCK_SERVER_PORT)
+    parser.add_argument('--transactions', type=int, default=10_000)
+    parser.add_argument('--accounts', type=int, default=2)
+    parser.add_argument('--days', type=int, default=365)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--latency', type=float, default=0.0, help="maximum seconds added to each response")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="share of requests answered with a 503")
+    parser.add_argument('--rate-limit-rate', type=float, default=0.0, help="share of requests answered with a 429")
+    parser.add_argument('--token', help="only accept this bearer token")
+    args = parser.parse_args()
+
+    api = MockUpApi(args.transactions, args.accounts, args.days, args.seed,
+                    args.latency, args.error_rate, args.rate_limit_rate, args.token)
+    server = ThreadingHTTPServer(('127.0.0.1', args.port), make_handler(api))
+    print(f"Mock Up API with {len(api.transactions)} transactions at http://127.0.0.1:{args.port}{API_PREFIX}")
+    server.serve_forever()
+
+if __name__ == '__main__':
+    main()
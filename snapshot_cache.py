@@ -0,0 +1,170 @@
+'''
+Process-wide LRU cache of dashboard snapshots (and of the views built from them) shared by every Streamlit session
+'''
+
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+# Per-point arrays of a Plotly trace, and what a figure costs beyond them (layout, template, trace settings)
+FIGURE_ARRAYS = ('x', 'y', 'z', 'values', 'labels', 'text', 'hovertext', 'customdata', 'ids')
+FIGURE_BASE_BYTES = 16 * 1024
+# Assumed size of one item of an object array or list (a short string or a boxed number)
+ITEM_BYTES = 64
+
+def _array_bytes(values):
+    if isinstance(values, np.ndarray) and values.dtype != object:
+        return values.nbytes
+    return len(values) * ITEM_BYTES if hasattr(values, '__len__') else ITEM_BYTES
+
+def _figure_bytes(figure):
+    # Counting the points is cheap; serializing the figure to measure it cost as much as building the view
+    size = FIGURE_BASE_BYTES
+    for trace in figure.data:
+        for name in FIGURE_ARRAYS:
+            if name in trace and trace[name] is not None:
+                size += _array_bytes(trace[name])
+    return size
+
+def estimate_bytes(value):
+    """Approximate memory held by a cached value: frames, Plotly figures and dicts, lists or tuples of them"""
+    if hasattr(value, 'memory_bytes'):
+        return value.memory_bytes()
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        return int(value.memory_usage(deep=True).sum())
+    if hasattr(value, 'to_plotly_json'):
+        return _figure_bytes(value)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(estimate_bytes(item) for item in value.values())
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(estimate_bytes(item) for item in value)
+    return sys.getsizeof(value)
+
+class SnapshotCache:
+    """
+    Thread-safe LRU cache bounded by an approximate memory budget.
+
+    Entries are keyed by the caller (e.g. a token hash, never the raw token)
+    and expire `ttl` seconds after they were stored. Once the total size of
+    the entries exceeds `max_mb`, the least recently used ones are evicted.
+    Sizes come from estimate_bytes().
+
+    get_or_build() makes concurrent sessions of the same user (several
+    browser tabs) wait for one build instead of each building their own.
+    Callers that refresh an entry in the background pass allow_expired to
+    keep serving it past its TTL until the refresh replaces it.
+    """
+
+    def __init__(self, max_mb=512, ttl=300):
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.ttl = ttl
+        self.entries = OrderedDict()  # key -> (value, size_bytes, expires_at)
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self._lock = threading.Lock()
+        self._build_locks = {}
+
+    def get(self, key, allow_expired=False):
+        """The cached value for `key`, or None if it is missing or expired (unless allow_expired)"""
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is not None and not allow_expired and entry[2] <= time.monotonic():
+                self._remove(key)
+                self.expirations += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value, ttl=None):
+        """Store `value` under `key`, evicting least recently used entries to stay within the budget"""
+        size = estimate_bytes(value)
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            if key in self.entries:
+                self._remove(key)
+            if size > self.max_bytes:
+                # Caching it would evict everything else and still not fit
+                return value
+            self.entries[key] = (value, size, expires_at)
+            self.total_bytes += size
+            while self.total_bytes > self.max_bytes:
+                self._remove(next(iter(self.entries)))
+                self.evictions += 1
+        return value
+
+    def get_or_build(self, key, build, ttl=None, force=False, allow_expired=False):
+        """Cached value for `key`, calling `build()` once (across threads) when it is missing"""
+        if not force:
+            value = self.get(key, allow_expired)
+            if value is not None:
+                return value
+        with self._lock:
+            build_lock = self._build_locks.setdefault(key, threading.Lock())
+        with build_lock:
+            # Another thread may have built it while this one waited
+            value = None if force else self.peek(key, allow_expired)
+            if value is None:
+                value = self.put(key, build(), ttl)
+        with self._lock:
+            if not build_lock.locked():
+                self._build_locks.pop(key, None)
+        return value
+
+    def pop(self, key):
+        """Drop `key` from the cache"""
+        with self._lock:
+            if key in self.entries:
+                self._remove(key)
+
+    def pop_where(self, match):
+        """Drop every key for which `match(key)` is true, returning how many were dropped"""
+        with self._lock:
+            keys = [key for key in self.entries if match(key)]
+            for key in keys:
+                self._remove(key)
+        return len(keys)
+
+    def clear(self):
+        """Drop every entry, keeping the counters"""
+        with self._lock:
+            self.entries.clear()
+            self.total_bytes = 0
+
+    def stats(self):
+        """Entry count, memory use and hit/miss/eviction counters"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self.entries),
+                'size_mb': round(self.total_bytes / (1024 * 1024), 2),
+                'max_mb': round(self.max_bytes / (1024 * 1024), 2),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 3) if lookups else None,
+                'evictions': self.evictions,
+                'expirations': self.expirations
+            }
+
+    def peek(self, key, allow_expired=False):
+        """Like get(), but without counting a hit or miss or marking the entry as recently used"""
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is None or (not allow_expired and entry[2] <= time.monotonic()):
+                return None
+            return entry[0]
+
+    def _remove(self, key):
+        # Caller holds self._lock
+        _, size, _ = self.entries.pop(key)
+        self.total_bytes -= size
@@ -0,0 +1,95 @@
+'''
+Background threads that keep cached snapshots fresh so reruns never wait on the API
+'''
+
+import threading
+import time
+
+from up_client import UpAuthError
+
+# Seconds between background refreshes of an active user's snapshot
+REFRESH_INTERVAL_SECONDS = 60
+# A worker stops once no session has asked for its snapshot for this long
+REFRESH_IDLE_SECONDS = 600
+
+class RefreshWorker(threading.Thread):
+    """Daemon thread rebuilding one cache entry every `interval` seconds until idle or stopped"""
+
+    def __init__(self, refresher, key, build):
+        super().__init__(name=f"snapshot-refresh-{key[0][:8]}", daemon=True)
+        self.refresher = refresher
+        self.key = key
+        self.build = build
+        self.last_used = time.monotonic()
+        self.last_error = None
+        self.stop_event = threading.Event()
+
+    def run(self):
+        while not self.stop_event.wait(self.refresher.interval):
+            if time.monotonic() - self.last_used > self.refresher.idle_timeout:
+                break
+            try:
+                self.refresher.cache.put(self.key, self.build(), self.refresher.ttl)
+                self.last_error = None
+            except UpAuthError as e:
+                # The token was revoked; retrying will not help
+                self.last_error = e
+                break
+            except Exception as e:
+                print(f"Error refreshing snapshot in the background: {str(e)}")
+                self.last_error = e
+        self.refresher.forget(self)
+
+class SnapshotRefresher:
+    """
+    One RefreshWorker per active cache key.
+
+    Sessions call touch() whenever they render, which starts a worker for
+    their key if none is running. The worker replaces the cached snapshot
+    on a schedule, so sessions always render the latest snapshot straight
+    from the cache and only the very first load waits for the API.
+    """
+
+    def __init__(self, cache, interval=REFRESH_INTERVAL_SECONDS, idle_timeout=REFRESH_IDLE_SECONDS, ttl=None):
+        self.cache = cache
+        self.interval = interval
+        self.idle_timeout = idle_timeout
+        self.ttl = ttl
+        self.workers = {}
+        self._lock = threading.Lock()
+
+    def touch(self, key, build):
+        """Mark `key` as in use, starting a worker that calls `build()` if none is running"""
+        with self._lock:
+            worker = self.workers.get(key)
+            if worker is None or not worker.is_alive():
+                worker = RefreshWorker(self, key, build)
+                self.workers[key] = worker
+                worker.start()
+            worker.last_used = time.monotonic()
+        return worker
+
+    def is_refreshing(self, key):
+        """Whether a worker is still refreshing `key`"""
+        with self._lock:
+            worker = self.workers.get(key)
+        return worker is not None and worker.is_alive() and not worker.stop_event.is_set()
+
+    def last_error(self, key):
+        """The error from the latest failed background refresh of `key`, if it is still failing"""
+        with self._lock:
+            worker = self.workers.get(key)
+        return worker.last_error if worker is not None else None
+
+    def stop(self, key):
+        """Stop refreshing `key`"""
+        with self._lock:
+            worker = self.workers.pop(key, None)
+        if worker is not None:
+            worker.stop_event.set()
+
+    def forget(self, worker):
+        """Drop a finished worker, unless it has already been replaced"""
+        with self._lock:
+            if self.workers.get(worker.key) is worker:
+                del self.workers[worker.key]
@@ -0,0 +1,66 @@
+'''
+Day-bucketed index over the date-sorted transactions frame for fast day, week and month slices
+'''
+
+from datetime import date, timedelta
+
+import numpy as np
+
+EPOCH = date(1970, 1, 1)
+
+def day_ordinal(day):
+    """Days since 1970-01-01 for a date"""
+    return (day - EPOCH).days
+
+class TimeIndex:
+    """
+    Precomputed day buckets over a transactions frame sorted by `date`.
+
+    Each transaction's `local_date` (see transaction_store.calendar_columns)
+    is turned into a day ordinal once, and `offsets[d - first_day]` holds the first row of day d.
+    Because the frame is sorted, every day, week or month is a contiguous
+    block of rows, so a range query is two array lookups and an iloc slice
+    instead of a scan over the whole date column.
+    """
+
+    def __init__(self, df):
+        self.df = df
+        dates = df['local_date'] if not df.empty else None
+        # The frame is sorted with missing dates last; they are never in any range
+        self.size = int(dates.notna().sum()) if dates is not None else 0
+        if self.size == 0:
+            self.first_day = 0
+            self.offsets = np.zeros(1, dtype=np.int64)
+            return
+        days = dates.iloc[:self.size].to_numpy().astype('datetime64[D]').astype(np.int64)
+        self.first_day = int(days[0])
+        self.offsets = np.searchsorted(days, np.arange(self.first_day, int(days[-1]) + 2))
+
+    def _offset(self, ordinal):
+        """Row where day `ordinal` starts (clamped to the indexed range)"""
+        position = ordinal - self.first_day
+        if position <= 0:
+            return 0
+        if position >= len(self.offsets):
+            return self.size
+        return int(self.offsets[position])
+
+    def between(self, start_day, end_day):
+        """Rows whose local date falls within [start_day, end_day], inclusive"""
+        start = self._offset(day_ordinal(start_day))
+        end = self._offset(day_ordinal(end_day) + 1)
+        return self.df.iloc[start:end]
+
+    def day(self, day):
+        """Rows on one local date"""
+        return self.between(day, day)
+
+    def week(self, week_start):
+        """Rows in the 7 days starting at `week_start`"""
+        return self.between(week_start, week_start + timedelta(days=6))
+
+    def month(self, year, month):
+        """Rows in a calendar month"""
+        first = date(year, month, 1)
+        next_first = date(year + month // 12, month % 12 + 1, 1)
+        return self.between(first, next_first - timedelta(days=1))
@@ -0,0 +1,128 @@
+'''
+Lightweight timing spans for pipeline stages, with per-rerun collection and p50/p95 history
+'''
+
+import contextvars
+import functools
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager, nullcontext
+
+import numpy as np
+
+# Spans are recorded only when UP_TIMING=1 (or after set_enabled(True))
+ENABLED = os.environ.get('UP_TIMING', '') == '1'
+# Durations kept per stage for the percentiles
+HISTORY_SIZE = 200
+
+# Each span is also logged here as one JSON object per line, if the logger is enabled for INFO
+logger = logging.getLogger('up_finance.timing')
+
+_DISABLED = nullcontext()
+_current_run = contextvars.ContextVar('timing_run', default=None)
+_history = {}
+_lock = threading.Lock()
+
+def set_enabled(enabled):
+    """Turn span recording on or off for the whole process"""
+    global ENABLED
+    ENABLED = enabled
+
+def span(name):
+    """Context manager timing a stage; a shared no-op when timing is disabled"""
+    if not ENABLED:
+        return _DISABLED
+    return _span(name)
+
+@contextmanager
+def _span(name):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, time.perf_counter() - start)
+
+def record(name, seconds):
+    """Add a measured duration to the history and to the current run"""
+    with _lock:
+        history = _history.get(name)
+        if history is None:
+            history = _history[name] = deque(maxlen=HISTORY_SIZE)
+        history.append(seconds)
+    run = _current_run.get()
+    if run is not None:
+        run.spans.append((name, seconds))
+    if logger.isEnabledFor(logging.INFO):
+        logger.info(json.dumps({
+            'event': 'span',
+            'name': name,
+            'ms': round(seconds * 1000, 3),
+            'run': run.run_id if run is not None else None
+        }))
+
+class Run:
+    """The spans recorded during one rerun of the app"""
+
+    def __init__(self, run_id):
+        self.run_id = run_id
+        self.spans = []
+
+    def totals(self):
+        """Seconds per stage name within this run, in the order first seen"""
+        totals = {}
+        for name, seconds in self.spans:
+            totals[name] = totals.get(name, 0.0) + seconds
+        return totals
+
+def start_run(run_id=None):
+    """Collect the following spans of this thread (and of contexts copied from it) into a new Run"""
+    run = Run(run_id or f"{time.time_ns():x}")
+    _current_run.set(run)
+    return run
+
+def current_run():
+    """The Run being collected, or None"""
+    return _current_run.get()
+
+def summary(run=None):
+    """Rows of stage, this run's ms, count, p50 and p95 ms over the history"""
+    with _lock:
+        history = {name: np.array(durations) for name, durations in _history.items()}
+    run_totals = run.totals() if run is not None else {}
+    rows = []
+    for name in sorted(history):
+        durations = history[name] * 1000
+        rows.append({
+            'stage': name,
+            'this_run_ms': round(run_totals[name] * 1000, 2) if name in run_totals else None,
+            'count': len(durations),
+            'p50_ms': round(float(np.percentile(durations, 50)), 2),
+            'p95_ms': round(float(np.percentile(durations, 95)), 2)
+        })
+    return rows
+
+def export_json():
+    """The full duration history per stage (seconds) as a JSON string"""
+    with _lock:
+        return json.dumps({name: list(durations) for name, durations in _history.items()})
+
+def reset():
+    """Forget the recorded history"""
+    with _lock:
+        _history.clear()
+
+def timed(name):
+    """Decorator wrapping every call of a function in span(name)"""
+    def decorate(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not ENABLED:
+                return function(*args, **kwargs)
+            with _span(name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorate
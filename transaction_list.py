@@ -0,0 +1,47 @@
+'''
+Paginated transaction list rendered as one HTML block per page instead of one element per row
+'''
+
+import html
+
+import streamlit as st
+
+# Rows sent to the browser per page; the payload stays this size however many transactions there are
+PAGE_SIZE = 50
+
+ROW_TEMPLATE = (
+    "<div style='padding:4px 0; border-bottom:1px solid #eee;'>"
+    "<b>{description}</b> <span style='float:right;'>${amount:.2f}</span>"
+    "</div>"
+)
+
+def transaction_list_html(df):
+    """One HTML string listing the frame's transactions, descriptions escaped"""
+    rows = zip(df['description'].tolist(), (df['amount_cents'] / 100).tolist())
+    return ''.join(
+        ROW_TEMPLATE.format(description=html.escape(str(description)), amount=amount)
+        for description, amount in rows
+    )
+
+def _set_page(page_key, page):
+    st.session_state[page_key] = page
+
+def render_transaction_list(df, key, page_size=PAGE_SIZE):
+    """
+    Show one page of `df` (already in display order) as a single markdown
+    element, with newer/older buttons when there is more than one page.
+    The current page is kept in st.session_state under `<key>_page`.
+    """
+    page_key = f"{key}_page"
+    pages = max(1, -(-len(df) // page_size))
+    page = min(st.session_state.get(page_key, 0), pages - 1)
+    start = page * page_size
+    st.markdown(transaction_list_html(df.iloc[start:start + page_size]), unsafe_allow_html=True)
+
+    if pages > 1:
+        prev_col, info_col, next_col = st.columns([1, 3, 1])
+        prev_col.button("‹ Newer", key=f"{key}_newer", disabled=page == 0,
+                        on_click=_set_page, args=(page_key, page - 1))
+        info_col.caption(f"{start + 1}–{min(start + page_size, len(df))} of {len(df)} transactions")
+        next_col.button("Older ›", key=f"{key}_older", disabled=page == pages - 1,
+                        on_click=_set_page, args=(page_key, page + 1))
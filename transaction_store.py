@@ -0,0 +1,614 @@
+'''
+Local columnar (Arrow IPC) store of normalized Up Banking transactions
+'''
+
+import hashlib
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from aggregate_cube import AggregateCube
+
+try:
+    import fcntl
+except ImportError:
+    # Without flock (Windows) stores are only locked against other threads of the same process
+    fcntl = None
+
+# Directory holding one store directory per (hashed) API token
+DATA_DIR = os.environ.get('UP_DATA_DIR', '.up_data')
+
+# Calendar columns and cube months are in this timezone unless the user picks another
+DEFAULT_TIMEZONE = os.environ.get('UP_TIMEZONE', 'Australia/Perth')
+
+# Appends go to small delta files; once there are this many they are compacted into the base file
+MAX_DELTA_FILES = 16
+
+# Status of the tombstone row delete() appends; it hides every earlier version of the transaction
+DELETED_STATUS = 'DELETED'
+
+BASE_FILE = 'transactions.arrow'
+META_FILE = 'meta.json'
+# Cubes are kept per timezone, as cube-<zone>.json; a store written before that has a single cube.json
+CUBE_PREFIX = 'cube-'
+LEGACY_CUBE_FILE = 'cube.json'
+LOCK_FILE = '.lock'
+
+_dictionary_string = pa.dictionary(pa.int32(), pa.string())
+_timestamp = pa.timestamp('ns', tz='UTC')
+
+SCHEMA = pa.schema([
+    ('id', pa.string()),
+    ('created_at', _timestamp),
+    # settledAt, falling back to createdAt; what the dashboard calls `date`
+    ('date', _timestamp),
+    ('status', _dictionary_string),
+    ('description', pa.string()),
+    ('amount_cents', pa.int64()),
+    ('category_id', _dictionary_string),
+    ('account_id', _dictionary_string),
+    ('raw_text', pa.string()),
+    ('transaction_type', _dictionary_string),
+    ('message', pa.string()),
+    ('tags', pa.list_(pa.string()))
+])
+
+# Free-text columns stay Arrow-backed in pandas instead of becoming Python objects
+_PANDAS_TYPES = {pa.string(): pd.StringDtype('pyarrow')}
+
+def token_hash(token):
+    """Hash an API token so it can key files and caches without being stored"""
+    return hashlib.sha256(token.encode('utf-8')).hexdigest()
+
+def parse_timestamps(values):
+    """
+    Parse RFC 3339 strings (None allowed) into a UTC DatetimeIndex.
+
+    Up timestamps always look like 2024-04-03T09:56:37+11:00, which is parsed
+    with plain NumPy arithmetic; anything else falls back to pd.to_datetime.
+    """
+    strings = np.asarray(values, dtype=object)
+    present = np.not_equal(strings, None)
+    result = np.full(len(strings), np.datetime64('NaT'), dtype='datetime64[ns]')
+    if present.any():
+        text = strings[present].astype('U')
+        if text.dtype.itemsize == 25 * 4 and (np.char.str_len(text) == 25).all():
+            chars = text.view(np.uint32).reshape(-1, 25)
+            signs = chars[:, 19]
+            if np.isin(signs, (ord('+'), ord('-'))).all():
+                digits = chars.astype(np.int64) - ord('0')
+                offsets = (digits[:, 20] * 10 + digits[:, 21]) * 3600 + (digits[:, 23] * 10 + digits[:, 24]) * 60
+                offsets = np.where(signs == ord('+'), offsets, -offsets)
+                local = text.astype('U19').astype('datetime64[s]')
+                result[present] = (local - offsets.astype('timedelta64[s]')).astype('datetime64[ns]')
+                return pd.DatetimeIndex(result).tz_localize('UTC')
+        result[present] = pd.to_datetime(text, utc=True, format='ISO8601').tz_localize(None).to_numpy()
+    return pd.DatetimeIndex(result).tz_localize('UTC')
+
+def _dictionary(values):
+    return pa.array(values, type=pa.string()).dictionary_encode()
+
+# Rows buffered as Python objects before they are converted into a compact Arrow chunk
+BATCH_ROWS = 10_000
+
+def resources_to_table(pages):
+    """
+    Convert pages of raw transaction resources into an Arrow table.
+
+    Every page is pulled into per-column buffers with one comprehension per
+    field as it arrives, so only one page of raw JSON is held at a time.
+    Every BATCH_ROWS rows the buffers are converted into an Arrow chunk
+    (timestamps parsed once per chunk), so a long crawl is held as compact
+    columns rather than Python objects.
+    """
+    chunks = []
+    columns = {name: [] for name in SCHEMA.names}
+    for page in pages:
+        attributes = [transaction['attributes'] for transaction in page]
+        relationships = [transaction['relationships'] for transaction in page]
+        columns['id'].extend([transaction['id'] for transaction in page])
+        columns['created_at'].extend([a.get('createdAt') for a in attributes])
+        # Prefer settledAt and fall back to createdAt
+        columns['date'].extend([a.get('settledAt') or a.get('createdAt') for a in attributes])
+        columns['status'].extend([a.get('status') for a in attributes])
+        columns['description'].extend([a['description'] for a in attributes])
+        columns['amount_cents'].extend([a['amount']['valueInBaseUnits'] for a in attributes])
+        columns['raw_text'].extend([a.get('rawText') or '' for a in attributes])
+        columns['transaction_type'].extend([a.get('transactionType') or '' for a in attributes])
+        columns['message'].extend([a.get('message') or None for a in attributes])
+        columns['category_id'].extend([r['category']['data']['id'] if r['category']['data'] else None for r in relationships])
+        columns['account_id'].extend([r['account']['data']['id'] for r in relationships])
+        columns['tags'].extend([[tag['id'] for tag in r['tags']['data']] if 'tags' in r else [] for r in relationships])
+        if len(columns['id']) >= BATCH_ROWS:
+            chunks.append(_columns_to_table(columns))
+            columns = {name: [] for name in SCHEMA.names}
+
+    if columns['id'] or not chunks:
+        chunks.append(_columns_to_table(columns))
+    if len(chunks) == 1:
+        return chunks[0]
+    # Each chunk has its own dictionaries; share one per column across chunks
+    return pa.concat_tables(chunks).unify_dictionaries()
+
+def _columns_to_table(columns):
+    return pa.table({
+        'id': pa.array(columns['id'], type=pa.string()),
+        'created_at': pa.array(parse_timestamps(columns['created_at']), type=_timestamp),
+        'date': pa.array(parse_timestamps(columns['date']), type=_timestamp),
+        'status': _dictionary(columns['status']),
+        'description': pa.array(columns['description'], type=pa.string()),
+        'amount_cents': pa.array(columns['amount_cents'], type=pa.int64()),
+        'category_id': _dictionary(columns['category_id']),
+        'account_id': _dictionary(columns['account_id']),
+        'raw_text': pa.array(columns['raw_text'], type=pa.string()),
+        'transaction_type': _dictionary(columns['transaction_type']),
+        'message': pa.array(columns['message'], type=pa.string()),
+        'tags': pa.array(columns['tags'], type=pa.list_(pa.string()))
+    }, schema=SCHEMA)
+
+def frames_from_table(table, categories, tz=DEFAULT_TIMEZONE):
+    """
+    Build the dashboard frames from a transactions table.
+
+    Returns `(df, tags_df)`: the normalized transaction frame (transfers
+    dropped, category ids resolved to names, sorted by date, with the
+    calendar_columns() of `tz`) and the long table of (transaction_id, tag)
+    pairs.
+    """
+    if table.num_rows == 0:
+        return pd.DataFrame(), pd.DataFrame(columns=['transaction_id', 'tag'])
+
+    # Skip internal transfers between accounts to avoid double counting
+    is_transfer = pc.fill_null(pc.equal(table['category_id'].cast(pa.string()), 'transfer'), False)
+    table = table.filter(pc.invert(is_transfer))
+    # Oldest first, missing dates last, so time ranges are contiguous (see time_index.TimeIndex)
+    table = table.sort_by([('date', 'ascending')])
+
+    # Create a lookup dictionary for category names
+    category_lookup = {}
+    for category in categories['data']:
+        category_lookup[category['id']] = category['attributes']['name']
+    category_ids = table['category_id'].to_pandas()
+    names = np.array(
+        [category_lookup.get(category_id, 'Uncategorized') for category_id in category_ids.cat.categories] + ['Uncategorized'],
+        dtype=object
+    )
+    # Missing category (code -1) picks the trailing 'Uncategorized'
+    category_names = pd.Categorical(names[category_ids.cat.codes.to_numpy()])
+
+    columns = {
+        'id': table['id'].to_pandas(types_mapper=_PANDAS_TYPES.get),
+        'date': table['date'].to_pandas(),
+        'description': table['description'].to_pandas(types_mapper=_PANDAS_TYPES.get),
+        'amount_cents': table['amount_cents'].to_pandas(),
+        'category': category_names,
+        'account_id': table['account_id'].to_pandas(),
+        'raw_text': table['raw_text'].to_pandas(types_mapper=_PANDAS_TYPES.get),
+        'transactionType': table['transaction_type'].to_pandas()
+    }
+    # Only keep the message column if any transaction has one
+    if table['message'].null_count < table.num_rows:
+        columns['message'] = table['message'].to_pandas(types_mapper=_PANDAS_TYPES.get)
+    # Local calendar keys are computed once here so no view has to convert timezones
+    df = pd.concat([pd.DataFrame(columns), calendar_columns(columns['date'], tz)], axis=1)
+
+    # Exploded tag table: one row per (transaction, tag) pair
+    tag_lists = table['tags'].combine_chunks()
+    tags_df = pd.DataFrame({
+        'transaction_id': table['id'].take(pc.list_parent_indices(tag_lists)).to_pandas(types_mapper=_PANDAS_TYPES.get),
+        'tag': pd.Categorical(pc.list_flatten(tag_lists).to_pandas())
+    })
+
+    return df, tags_df
+
+def month_labels(dates):
+    """'%Y-%m' labels for a datetime Series, formatting each distinct month only once"""
+    codes, months = pd.factorize(dates.dt.year * 100 + dates.dt.month)
+    labels = [f"{int(month) // 100:04d}-{int(month) % 100:02d}" for month in months]
+    return pd.Series(pd.Categorical.from_codes(codes, labels), index=dates.index)
+
+def calendar_columns(dates, tz):
+    """
+    Calendar keys of a UTC datetime Series in timezone `tz`.
+
+    Returns a frame with `local_date` (local midnight, tz-naive), `iso_year`,
+    `iso_week`, `weekday` (0 is Monday) and the '%Y-%m' `month` label.
+    """
+    local = dates.dt.tz_convert(tz).dt.tz_localize(None)
+    iso = local.dt.isocalendar()
+    return pd.DataFrame({
+        'local_date': local.dt.normalize(),
+        'iso_year': iso['year'].astype('Int16'),
+        'iso_week': iso['week'].astype('Int8'),
+        'weekday': local.dt.weekday.astype('Int8'),
+        'month': month_labels(local)
+    }, index=dates.index)
+
+def cube_frame(table, tz=DEFAULT_TIMEZONE):
+    """The columns an AggregateCube is keyed on, for every dated row of a transactions table"""
+    frame = pd.DataFrame({
+        'date': table['date'].to_pandas(),
+        'category_id': table['category_id'].to_pandas(),
+        'transaction_type': table['transaction_type'].to_pandas(),
+        'account_id': table['account_id'].to_pandas(),
+        'amount_cents': table['amount_cents'].to_pandas()
+    })
+    frame = frame[frame['date'].notna()]
+    frame['month'] = month_labels(frame['date'].dt.tz_convert(tz))
+    frame['sign'] = np.sign(frame['amount_cents'])
+    return frame
+
+def _write_table(path, table):
+    """Write an Arrow IPC file atomically (temp file + rename)"""
+    tmp_path = f"{path}.tmp"
+    # The IPC file format needs one dictionary per column
+    table = table.unify_dictionaries().combine_chunks()
+    with pa.OSFile(tmp_path, 'wb') as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    os.replace(tmp_path, path)
+
+# One reentrant lock per store directory, shared by every TransactionStore of it in this process
+_path_locks = {}
+_path_locks_lock = threading.Lock()
+
+def _path_lock(path):
+    with _path_locks_lock:
+        return _path_locks.setdefault(os.path.abspath(path), threading.RLock())
+
+def _read_table(path):
+    """Memory-map an Arrow IPC file; numeric columns are used in place without copying"""
+    with pa.memory_map(path, 'r') as source:
+        return pa.ipc.open_file(source).read_all()
+
+def _add_to_cube(cube, row, weight, tz):
+    # Same keys cube_frame() produces, for one row dict
+    if row['date'] is None:
+        return
+    month = pd.Timestamp(row['date']).tz_convert(tz).strftime('%Y-%m')
+    cube.add(month, row['category_id'], row['transaction_type'], row['account_id'], row['amount_cents'], weight)
+
+class TransactionStore:
+    """
+    Normalized transactions plus per-account high-water marks for one token.
+
+    Data lives in `<data_dir>/<token hash>/`: a base Arrow IPC file sorted
+    newest first, small delta files appended atomically by each sync, and a
+    meta.json with the high-water marks. Loading memory-maps the files, so a
+    warm start reads from the page cache instead of crawling the API.
+    Deltas are folded into the base file by compact(). Single changes from
+    webhooks go through apply() and delete(), which only touch the changed
+    row and its cube cell.
+
+    Several instances (the dashboard's syncs, the webhook receiver) may use
+    the same directory. Every read and write holds a lock file shared by all
+    of them, and what an instance has loaded is dropped by refresh() as soon
+    as another one has written, so no write is based on stale data.
+
+    An AggregateCube of monthly sums is kept next to the data and updated
+    with each delta, so aggregates never need a full pass. Months are local
+    to a timezone, so there is one cube file per timezone the store has been
+    opened with, and every write updates all of them.
+    """
+
+    def __init__(self, path, tz=DEFAULT_TIMEZONE):
+        self.path = path
+        self.tz = tz
+        self.high_water_marks = {}
+        self._table = None
+        self._cube = None
+        # id -> row position in self._table, and rows changed since it was loaded (None if deleted)
+        self._positions = None
+        self._overrides = {}
+        # What the data files and meta.json looked like when this instance last read or wrote them
+        self._data_state = None
+        self._meta_state = None
+        self._lock_file = None
+        self.load()
+
+    @classmethod
+    def for_token(cls, token, data_dir=DATA_DIR, tz=DEFAULT_TIMEZONE):
+        """Open the store belonging to an API token"""
+        return cls(os.path.join(data_dir, token_hash(token)), tz)
+
+    def load(self):
+        """Load the high-water marks, starting empty if the store does not exist yet"""
+        meta_path = os.path.join(self.path, META_FILE)
+        if not os.path.exists(meta_path):
+            return
+        try:
+            with open(meta_path, 'r') as f:
+                self.high_water_marks = json.load(f).get('high_water_marks', {})
+        except Exception as e:
+            print(f"Error loading transaction store: {str(e)}")
+            self.high_water_marks = {}
+
+    def save(self):
+        """Write the high-water marks atomically"""
+        high_water_marks = self.high_water_marks
+        with self.locked():
+            # Taking the lock may have reloaded the marks another instance saved; these replace them
+            self.high_water_marks = high_water_marks
+            meta_path = os.path.join(self.path, META_FILE)
+            tmp_path = f"{meta_path}.tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump({'high_water_marks': self.high_water_marks}, f)
+            os.replace(tmp_path, meta_path)
+            self._record_disk_state()
+
+    @contextmanager
+    def locked(self):
+        """
+        Hold the store's lock, shared by every instance using this directory in
+        any thread or process, after refresh()ing what others wrote before.
+        Reentrant, so locked methods can call each other.
+        """
+        with _path_lock(self.path):
+            if self._lock_file is not None:
+                yield
+                return
+            os.makedirs(self.path, exist_ok=True)
+            with open(os.path.join(self.path, LOCK_FILE), 'a') as lock_file:
+                # Closing the file releases the flock
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX)
+                self._lock_file = lock_file
+                try:
+                    self.refresh()
+                    yield
+                finally:
+                    self._lock_file = None
+
+    def refresh(self):
+        """Drop the loaded table, id index and cube (and reload the marks) if another instance changed them on disk"""
+        data_state, meta_state = self._disk_state()
+        if data_state != self._data_state:
+            self._table = None
+            self._positions = None
+            self._overrides = {}
+            self._cube = None
+            self._data_state = data_state
+        if meta_state != self._meta_state:
+            self.load()
+            self._meta_state = meta_state
+
+    def _disk_state(self):
+        # (name, inode, mtime, size) of the data files, and of meta.json; every write replaces or adds a file
+        files = []
+        if os.path.isdir(self.path):
+            for entry in os.scandir(self.path):
+                if entry.name.endswith(('.arrow', '.json')):
+                    stat = entry.stat()
+                    files.append((entry.name, stat.st_ino, stat.st_mtime_ns, stat.st_size))
+        files.sort()
+        return tuple(f for f in files if f[0] != META_FILE), tuple(f for f in files if f[0] == META_FILE)
+
+    def _record_disk_state(self):
+        # Called after this instance's own writes, whose effects it has already applied in memory
+        self._data_state, self._meta_state = self._disk_state()
+
+    def content_version(self):
+        """Hash of the transaction files on disk, which changes with every write by any instance"""
+        with self.locked():
+            transaction_files = tuple(f for f in self._data_state if f[0].endswith('.arrow'))
+        return hashlib.sha256(repr(transaction_files).encode('utf-8')).hexdigest()
+
+    def delta_paths(self):
+        """Delta files in the order they were written"""
+        if not os.path.isdir(self.path):
+            return []
+        names = sorted(name for name in os.listdir(self.path) if name.startswith('delta-') and name.endswith('.arrow'))
+        return [os.path.join(self.path, name) for name in names]
+
+    def load_table(self):
+        """All stored transactions as one Arrow table, newest first, latest version of each id"""
+        with self.locked():
+            if self._table is None or self._overrides:
+                self._table = self._read_latest()
+                self._positions = None
+                self._overrides = {}
+            return self._table
+
+    def _read_latest(self):
+        base_path = os.path.join(self.path, BASE_FILE)
+        tables = [_read_table(base_path)] if os.path.exists(base_path) else []
+        delta_paths = self.delta_paths()
+        tables.extend(_read_table(path) for path in delta_paths)
+        if not tables:
+            table = SCHEMA.empty_table()
+        elif not delta_paths:
+            # The base file is already deduplicated and sorted
+            table = tables[0]
+        else:
+            table = pa.concat_tables(tables)
+            # Later deltas win over earlier versions of the same transaction
+            latest = ~table['id'].to_pandas().duplicated(keep='last').to_numpy()
+            table = table.filter(pa.array(latest))
+            # Deleted transactions have a tombstone as their latest version
+            deleted = pc.fill_null(pc.equal(table['status'].cast(pa.string()), DELETED_STATUS), False)
+            table = table.filter(pc.invert(deleted)).sort_by([('created_at', 'descending')])
+        return table
+
+    def get(self, transaction_id):
+        """The stored version of one transaction as a row dict, or None; O(1) once the id index is built"""
+        with self.locked():
+            if transaction_id in self._overrides:
+                return self._overrides[transaction_id]
+            if self._table is None:
+                self.load_table()
+            if self._positions is None:
+                self._positions = {id_: position for position, id_ in enumerate(self._table['id'].to_pylist())}
+            position = self._positions.get(transaction_id)
+            return None if position is None else self._table.slice(position, 1).to_pylist()[0]
+
+    def upsert(self, resources):
+        """Append new and changed transactions as a delta file, returning how many changed"""
+        return self.upsert_pages([list(resources)])
+
+    def upsert_pages(self, pages):
+        """upsert() for an iterable of pages of resources, consumed one page at a time (see resources_to_table)"""
+        incoming = resources_to_table(pages)
+        if incoming.num_rows == 0:
+            return 0
+        latest = ~incoming['id'].to_pandas().duplicated(keep='last').to_numpy()
+        incoming = incoming.filter(pa.array(latest))
+
+        with self.locked():
+            # Drop rows identical to what is already stored
+            cube = self.load_cube()
+            existing = self.load_table()
+            existing = existing.filter(pc.is_in(existing['id'], value_set=incoming['id']))
+            if existing.num_rows:
+                stored = {row['id']: row for row in existing.to_pylist()}
+                changed = np.array([stored.get(row['id']) != row for row in incoming.to_pylist()])
+                incoming = incoming.filter(pa.array(changed))
+                existing = existing.filter(pc.is_in(existing['id'], value_set=incoming['id']))
+            if incoming.num_rows == 0:
+                return 0
+
+            os.makedirs(self.path, exist_ok=True)
+            _write_table(os.path.join(self.path, f"delta-{time.time_ns():020d}.arrow"), incoming)
+            self._table = None
+            # Replace the old versions of changed transactions in the cubes with the new ones
+            def update(cube, tz):
+                cube.add_frame(cube_frame(existing, tz), weight=-1)
+                cube.add_frame(cube_frame(incoming, tz))
+            self._update_cubes(cube, update)
+            if len(self.delta_paths()) >= MAX_DELTA_FILES:
+                self.compact()
+            self._record_disk_state()
+            return incoming.num_rows
+
+    def apply(self, resource):
+        """Insert or update a single transaction resource, returning 1 if it changed and 0 if not"""
+        incoming = resources_to_table([[resource]])
+        row = incoming.to_pylist()[0]
+        with self.locked():
+            stored = self.get(row['id'])
+            if stored == row:
+                return 0
+            self._write_change(incoming, row['id'], stored, row)
+        return 1
+
+    def delete(self, transaction_id):
+        """Remove a single transaction by appending a tombstone, returning 1 if it was stored"""
+        with self.locked():
+            stored = self.get(transaction_id)
+            if stored is None:
+                return 0
+            tombstone = pa.Table.from_pylist([dict(stored, status=DELETED_STATUS)], schema=SCHEMA)
+            self._write_change(tombstone, transaction_id, stored, None)
+        return 1
+
+    def _write_change(self, delta, transaction_id, stored, row):
+        # One-row delta plus an O(1) update of each cube; the loaded table is patched through _overrides.
+        # Callers hold the lock.
+        cube = self.load_cube()
+        os.makedirs(self.path, exist_ok=True)
+        _write_table(os.path.join(self.path, f"delta-{time.time_ns():020d}.arrow"), delta)
+        def update(cube, tz):
+            if stored is not None:
+                _add_to_cube(cube, stored, -1, tz)
+            if row is not None:
+                _add_to_cube(cube, row, 1, tz)
+        self._update_cubes(cube, update)
+        self._overrides[transaction_id] = row
+        if len(self.delta_paths()) >= MAX_DELTA_FILES:
+            self.compact()
+        self._record_disk_state()
+
+    def _cube_path(self, tz):
+        return os.path.join(self.path, f"{CUBE_PREFIX}{tz.replace('/', '-')}.json")
+
+    def _cube_paths(self):
+        # Every timezone's cube file, this store's own included
+        if not os.path.isdir(self.path):
+            return []
+        return [os.path.join(self.path, name) for name in os.listdir(self.path)
+                if name.startswith(CUBE_PREFIX) and name.endswith('.json')]
+
+    def _update_cubes(self, cube, update):
+        # Apply update(cube, tz) to this store's cube, loaded before the delta was written, and to
+        # the cube file of every other timezone. Callers hold the lock.
+        own_path = self._cube_path(self.tz)
+        update(cube, self.tz)
+        cube.save(own_path)
+        for path in self._cube_paths():
+            if path == own_path:
+                continue
+            other = AggregateCube.load(path)
+            if other.timezone is None:
+                os.remove(path)
+                continue
+            update(other, other.timezone)
+            other.save(path)
+
+    def compact(self):
+        """Fold every delta into a single sorted, deduplicated base file"""
+        with self.locked():
+            delta_paths = self.delta_paths()
+            if not delta_paths:
+                return
+            table = self.load_table()
+            _write_table(os.path.join(self.path, BASE_FILE), table)
+            for path in delta_paths:
+                os.remove(path)
+            self._table = None
+            # Rebuild the cubes from scratch so any drift is corrected
+            own_path = self._cube_path(self.tz)
+            for path in self._cube_paths():
+                if path == own_path:
+                    continue
+                tz = AggregateCube.load(path).timezone
+                if tz is not None and path == self._cube_path(tz):
+                    AggregateCube.from_frame(cube_frame(table, tz), tz).save(path)
+                else:
+                    os.remove(path)
+            self._cube = AggregateCube.from_frame(cube_frame(table, self.tz), self.tz)
+            self._cube.save(own_path)
+            self._record_disk_state()
+
+    def load_cube(self):
+        """The AggregateCube for the store's timezone, built from the table the first time it is needed"""
+        with self.locked():
+            if self._cube is not None:
+                return self._cube
+            legacy_path = os.path.join(self.path, LEGACY_CUBE_FILE)
+            if os.path.exists(legacy_path):
+                # Keep the single cube of an older store as the cube of the timezone it was built for
+                legacy = AggregateCube.load(legacy_path)
+                if legacy.timezone is not None:
+                    os.replace(legacy_path, self._cube_path(legacy.timezone))
+                else:
+                    os.remove(legacy_path)
+            cube_path = self._cube_path(self.tz)
+            if os.path.exists(cube_path):
+                self._cube = AggregateCube.load(cube_path)
+            if self._cube is None or self._cube.timezone != self.tz:
+                self._cube = AggregateCube.from_frame(cube_frame(self.load_table(), self.tz), self.tz)
+                self._cube.save(cube_path)
+                self._record_disk_state()
+            return self._cube
+
+    def oldest_held_created_at(self):
+        """createdAt of the oldest transaction still HELD, or None if everything has settled"""
+        table = self.load_table()
+        held = pc.fill_null(pc.equal(table['status'].cast(pa.string()), 'HELD'), False)
+        return pc.min(table.filter(held)['created_at']).as_py()
+
+    def ids_created_between(self, since, until):
+        """Ids of the stored transactions created in [since, until), as a set"""
+        table = self.load_table()
+        created_at = table['created_at']
+        in_window = pc.and_(
+            pc.greater_equal(created_at, pa.scalar(pd.Timestamp(since), type=_timestamp)),
+            pc.less(created_at, pa.scalar(pd.Timestamp(until), type=_timestamp))
+        )
+        return set(table.filter(in_window)['id'].to_pylist())
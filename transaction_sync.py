@@ -0,0 +1,240 @@
+'''
+Incremental sync of Up Banking transactions into a local store
+'''
+
+import contextvars
+import os
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+PAGE_SIZE = 100
+
+# Requests in flight at once across all partitions of a crawl
+MAX_CONCURRENT_REQUESTS = 8
+# Pages fetched ahead of the consumer per request in flight, bounding the raw JSON held during a crawl
+PAGES_AHEAD = 2
+
+# A full crawl splits each account's history into about one date window per request in flight,
+# none shorter than MIN_WINDOW, so the transactional account holding most of it is crawled in parallel
+AUTO_WINDOW = 'auto'
+MIN_WINDOW = timedelta(days=7)
+
+def window_setting(value):
+    """A PartitionedCrawler window from a setting: 'auto', a number of days, or 0 for one partition per account"""
+    if value == AUTO_WINDOW:
+        return AUTO_WINDOW
+    days = float(value)
+    return timedelta(days=days) if days > 0 else None
+
+# Override with UP_SYNC_WINDOW_DAYS, e.g. 90 for fixed 90-day windows or 0 to turn windows off
+SYNC_WINDOW = window_setting(os.environ.get('UP_SYNC_WINDOW_DAYS', AUTO_WINDOW))
+
+# Re-request a little before the high-water mark so items that arrive late are not missed
+SYNC_OVERLAP = timedelta(days=3)
+
+def parse_timestamp(value):
+    """Parse an Up RFC 3339 timestamp into an aware UTC datetime"""
+    return datetime.fromisoformat(value).astimezone(timezone.utc)
+
+def iter_pages(fetch_json, path, params=None):
+    """Yield each page of transactions in turn, following links.next, holding one page at a time"""
+    params = dict(params or {}, **{'page[size]': PAGE_SIZE})
+    data = fetch_json(path, params)
+    while True:
+        yield data['data']
+        next_url = data['links'].get('next')
+        if not next_url:
+            return
+        data = fetch_json(next_url)
+
+def date_windows(start, end, window):
+    """Split [start, end) into consecutive windows of at most `window`, newest first"""
+    windows = []
+    until = end
+    while until > start:
+        since = max(start, until - window)
+        windows.append((since, until))
+        until = since
+    return windows
+
+class PartitionedCrawler:
+    """
+    Crawls transaction history split into independent partitions.
+
+    History is split by account through /accounts/{id}/transactions and,
+    when `window` is set, further into filter[since]/filter[until] date
+    windows starting at each account's createdAt. `window` is a timedelta,
+    AUTO_WINDOW to size the windows from each account's age, or None. Partitions are crawled in
+    parallel with at most `max_workers` requests in flight, and their pages
+    are yielded as they arrive. Only a few pages per worker are buffered,
+    so the raw JSON held never depends on the length of the history.
+    """
+
+    def __init__(self, fetch_json, max_workers=MAX_CONCURRENT_REQUESTS, window=SYNC_WINDOW):
+        self.fetch_json = fetch_json
+        self.max_workers = max_workers
+        self.window = window
+
+    def partitions(self, accounts, until):
+        """(path, params) for every partition of the given account resources"""
+        partitions = []
+        for account in accounts:
+            path = f"/accounts/{account['id']}/transactions"
+            created_at = account.get('attributes', {}).get('createdAt')
+            if self.window and created_at:
+                start = parse_timestamp(created_at)
+                for since, window_until in date_windows(start, until, self.window_size(start, until)):
+                    partitions.append((path, {
+                        'filter[since]': since.isoformat(),
+                        'filter[until]': window_until.isoformat()
+                    }))
+            else:
+                partitions.append((path, {}))
+        return partitions
+
+    def window_size(self, start, until):
+        """Length of the date windows for a history running from start to until"""
+        if self.window != AUTO_WINDOW:
+            return self.window
+        # Rounded up, so rounding never leaves a sliver for an extra window
+        return max(MIN_WINDOW, -((start - until) // self.max_workers))
+
+    def crawl(self, accounts):
+        """
+        Crawl every partition in parallel, yielding pages in the order they
+        arrive. Partitions may overlap at their edges, so a transaction can
+        appear twice; TransactionStore.upsert_pages() keeps one version.
+        """
+        partitions = self.partitions(accounts, datetime.now(timezone.utc))
+        pages = queue.Queue(maxsize=PAGES_AHEAD * self.max_workers)
+        stopped = threading.Event()
+        done = object()
+
+        def put(item):
+            # Give up once the consumer has stopped, so no worker blocks on a full queue forever
+            while not stopped.is_set():
+                try:
+                    pages.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    pass
+            return False
+
+        def crawl_partition(path, params):
+            try:
+                for page in self.crawl_partition(path, params):
+                    if not put(page):
+                        return
+                put(done)
+            except Exception as e:
+                put(e)
+
+        pool = ThreadPoolExecutor(max_workers=self.max_workers)
+        try:
+            for partition in partitions:
+                # Run each partition in a copy of this context so its request spans count towards the current rerun
+                pool.submit(contextvars.copy_context().run, crawl_partition, *partition)
+            remaining = len(partitions)
+            while remaining:
+                item = pages.get()
+                if item is done:
+                    remaining -= 1
+                elif isinstance(item, Exception):
+                    raise item
+                else:
+                    yield item
+        finally:
+            stopped.set()
+            pool.shutdown(wait=True, cancel_futures=True)
+
+    def crawl_partition(self, path, params):
+        """Follow links.next through one partition, yielding one page at a time"""
+        yield from iter_pages(self.fetch_json, path, params)
+
+# One lock per store directory, so syncs of a token in this process (one per timezone it is
+# viewed in) run one at a time and each starts from the marks the previous one saved
+_sync_locks = {}
+_sync_locks_lock = threading.Lock()
+
+def _sync_lock(path):
+    with _sync_locks_lock:
+        return _sync_locks.setdefault(os.path.abspath(path), threading.Lock())
+
+class TransactionSync:
+    """
+    Keeps a transaction_store.TransactionStore up to date with the API.
+
+    The first sync crawls the full history, partitioned by account and date
+    window (see SYNC_WINDOW) and crawled in parallel. Later syncs only request the window since the
+    oldest per-account high-water mark (pulled back to the oldest HELD
+    transaction so HELD -> SETTLED changes are picked up), which is usually
+    a single page regardless of how long the history is. That window is
+    re-requested in full, so a stored transaction in it that the API no
+    longer returns, such as a reversed HELD one, is deleted.
+
+    `fetch_json(path_or_url, params=None)` performs the GET, e.g.
+    `up_api_service.fetch_json`.
+    """
+
+    def __init__(self, store, fetch_json, crawler=None):
+        self.store = store
+        self.fetch_json = fetch_json
+        self.crawler = crawler or PartitionedCrawler(fetch_json)
+
+    def sync(self, accounts):
+        """
+        Bring the store up to date, returning how many transactions changed.
+
+        `accounts` is the list of the user's account resources, or a callable
+        returning one. On incremental syncs a callable is resolved only after
+        the main request, so the accounts can be fetched concurrently with it.
+        Syncs of the same store wait for each other.
+        """
+        with _sync_lock(self.store.path):
+            return self._sync(accounts)
+
+    def _sync(self, accounts):
+        started_at = datetime.now(timezone.utc)
+        # Taking the store's lock picks up the marks a sync that just finished saved
+        with self.store.locked():
+            marks = self.store.high_water_marks
+
+        changed = 0
+        if not marks:
+            # Nothing synced yet: crawl every account's full history in parallel
+            if callable(accounts):
+                accounts = accounts()
+            changed += self.store.upsert_pages(self.crawler.crawl(accounts))
+        else:
+            since = self.since(marks)
+            returned = set()
+            def pages():
+                for page in iter_pages(self.fetch_json, "/transactions", {'filter[since]': since.isoformat()}):
+                    returned.update(resource['id'] for resource in page)
+                    yield page
+            changed += self.store.upsert_pages(pages())
+            # Up deletes a HELD transaction when it is reversed; drop what the window no longer holds
+            for transaction_id in self.store.ids_created_between(since, started_at) - returned:
+                changed += self.store.delete(transaction_id)
+            if callable(accounts):
+                accounts = accounts()
+            # Accounts opened since the last sync need their own full history
+            new_accounts = [account for account in accounts if account['id'] not in marks]
+            if new_accounts:
+                changed += self.store.upsert_pages(self.crawler.crawl(new_accounts))
+
+        # Closed accounts are dropped so their stale marks don't widen the window
+        self.store.high_water_marks = {account['id']: started_at.isoformat() for account in accounts}
+        self.store.save()
+        return changed
+
+    def since(self, account_ids):
+        """Start of the window that has to be re-requested for the given accounts"""
+        since = min(parse_timestamp(self.store.high_water_marks[account_id]) for account_id in account_ids)
+        since -= SYNC_OVERLAP
+        oldest_held = self.store.oldest_held_created_at()
+        if oldest_held is not None and oldest_held < since:
+            since = oldest_held
+        return since
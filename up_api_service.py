@@ -3,241 +3,443 @@ Service to handle Up Banking API operations and format conversions
 '''
 
 import pandas as pd
-from datetime import datetime
+import contextvars
+import copy
+import hashlib
+import itertools
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 import os
 import json
 from mock_data import get_accounts_data, get_transactions_data, get_categories_data
+from aggregate_cube import AggregateCube
+from downsample import bucket_frequency, bucket_starts, lttb
+from snapshot_cache import SnapshotCache
+from snapshot_refresher import SnapshotRefresher
+from time_index import TimeIndex
+from timing import current_run, export_json, span, summary, timed
+from transaction_store import DEFAULT_TIMEZONE, TransactionStore, cube_frame, frames_from_table, resources_to_table, token_hash
+from transaction_sync import TransactionSync, iter_pages
+from up_client import UpApiError, UpClient
 import streamlit as st
 
 USE_MOCK_DATA = False
 
-def get_accounts():
+# One pooled, retrying, rate-limited client shared by every request (and session) this module makes.
+# Failures raise up_client.UpApiError subclasses instead of falling back to mock data.
+client = UpClient()
+
+# How long a fetched snapshot is reused across reruns before it is refetched
+SNAPSHOT_TTL_SECONDS = 300
+# Memory all cached snapshots in this process may use before the least recently used are dropped
+SNAPSHOT_CACHE_MB = float(os.environ.get('UP_SNAPSHOT_CACHE_MB', 512))
+
+# Snapshots shared by every session (and browser tab) of the same user in this process
+snapshot_cache = SnapshotCache(max_mb=SNAPSHOT_CACHE_MB, ttl=SNAPSHOT_TTL_SECONDS)
+# Rebuilds each active user's cached snapshot in the background
+refresher = SnapshotRefresher(snapshot_cache)
+
+# Points a trend chart is reduced to by default, about one per two pixels of a full-width chart
+TREND_MAX_POINTS = 400
+
+# Memory the dashboard views' grouped frames and figures may use, and how long unused ones are kept
+VIEW_CACHE_MB = float(os.environ.get('UP_VIEW_CACHE_MB', 64))
+VIEW_TTL_SECONDS = 900
+# Views keyed by snapshot version and view parameters, so reruns over unchanged data skip pandas and Plotly
+view_cache = SnapshotCache(max_mb=VIEW_CACHE_MB, ttl=VIEW_TTL_SECONDS)
+
+# Snapshots are versioned by the stored transactions and categories they were built from, so views built
+# from older data are never served again; mock snapshots, which have no store, get a new number each time
+_snapshot_versions = itertools.count(1)
+
+def get_api_token():
+    """Get the Up API token for the current Streamlit session"""
+    return st.session_state.get('UP_API_TOKEN', '')
+
+def get_user_timezone():
+    """Get the timezone the current Streamlit session's user sees dates in"""
+    return st.session_state.get('UP_TIMEZONE') or DEFAULT_TIMEZONE
+
+def fetch_json(path_or_url, params=None, token=None):
+    """
+    GET an Up API path or absolute URL through the shared client.
+
+    Pass `token` explicitly when calling from a worker thread, where the
+    Streamlit session state is not available.
+    """
+    return client.get_json(path_or_url, params, token=token or get_api_token())
+
+@timed('fetch.accounts')
+def get_accounts(token=None):
     """Get accounts data from Up API or mock data"""
     if USE_MOCK_DATA:
         return get_accounts_data()
     
-    # Use real API
-    import requests
-    
-    url = "https://api.up.com.au/api/v1/accounts"
-    headers = {
-        "Authorization": f"Bearer {API_TOKEN}"
-    }
+    return fetch_json('/accounts', token=token)
+
+@timed('fetch.sync_transactions')
+def sync_transactions(accounts=None, token=None, tz=DEFAULT_TIMEZONE):
+    """
+    Sync the token's local transaction store with the Up API and return it.
+
+    Transactions are synced incrementally, so after the first load only new
+    or changed items are requested. `accounts` may be a list of account
+    resources or a callable returning one; a callable is only resolved after
+    the main request, so the accounts request can run alongside it.
+    """
+    token = token or get_api_token()
+    if accounts is None:
+        accounts = lambda: get_accounts(token)['data']
+    store = TransactionStore.for_token(token, tz=tz)
+    TransactionSync(store, partial(fetch_json, token=token)).sync(accounts)
+    return store
+
+def get_transaction_pages(token=None):
+    """Yield raw transactions from Up API or mock data one page at a time, newest first"""
+    if USE_MOCK_DATA:
+        yield get_transactions_data()['data']
+        return
     
-    try:
-        response = requests.get(url, headers=headers)
-        response.raise_for_status()  # Raise an error for bad responses
-        return response.json()
-    except Exception as e:
-        print(f"Error fetching accounts: {str(e)}")
-        # Fallback to mock data if API fails
-        return get_accounts_data()
+    token = token or get_api_token()
+    yield from iter_pages(partial(fetch_json, token=token), '/transactions')
 
-def get_transactions():
+def get_transactions(token=None):
     """Get transactions data from Up API or mock data"""
+    # Return in the same format as mock data
+    return {'data': [transaction for page in get_transaction_pages(token) for transaction in page]}
+
+def get_transaction(transaction_id, token=None):
+    """Get a single transaction from Up API or mock data"""
     if USE_MOCK_DATA:
-        return get_transactions_data()
-    
-    # Use real API
-    import requests
+        for transaction in get_transactions_data()['data']:
+            if transaction['id'] == transaction_id:
+                return {'data': transaction}
+        raise UpApiError(f"Transaction {transaction_id} not found", status_code=404)
     
-    url = "https://api.up.com.au/api/v1/transactions?page[size]=100"
-    headers = {
-        "Authorization": f"Bearer {API_TOKEN}"
-    }
-    
-    try:
-        # Initial request
-        response = requests.get(url, headers=headers)
-        response.raise_for_status()
-        data = response.json()
-        all_transactions = data['data']
-        
-        # Fetch additional pages if available
-        while 'next' in data['links'] and data['links']['next']:
-            response = requests.get(data['links']['next'], headers=headers)
-            response.raise_for_status()
-            data = response.json()
-            all_transactions.extend(data['data'])
-            
-            # Limit to 500 transactions to avoid excessive API calls
-            if len(all_transactions) >= 500:
-                break
-        
-        # Return in the same format as mock data
-        return {'data': all_transactions}
-    except Exception as e:
-        print(f"Error fetching transactions: {str(e)}")
-        # Fallback to mock data if API fails
-        return get_transactions_data()
-
-def get_categories():
+    return fetch_json(f'/transactions/{transaction_id}', token=token)
+
+@timed('fetch.categories')
+def get_categories(token=None):
     """Get categories data from Up API or mock data"""
     if USE_MOCK_DATA:
         return get_categories_data()
     
-    # Use real API
-    import requests
-    
-    url = "https://api.up.com.au/api/v1/categories"
-    headers = {
-        "Authorization": f"Bearer {API_TOKEN}"
-    }
-    
-    try:
-        response = requests.get(url, headers=headers)
-        response.raise_for_status()
-        return response.json()
-    except Exception as e:
-        print(f"Error fetching categories: {str(e)}")
-        # Fallback to mock data if API fails
-        return get_categories_data()
+    return fetch_json('/categories', token=token)
 
-def get_total_balance():
-    """Calculate total balance across all accounts"""
-    accounts = get_accounts()
-    total = 0.0
-    
-    for account in accounts['data']:
-        total += float(account['attributes']['balance']['value'])
-    
-    return total
+def fetch_dashboard_data(token=None, tz=None):
+    """
+    Fetch accounts, categories and transactions concurrently.
 
-def format_transactions_for_dashboard():
-    """Convert Up Banking transaction format to a format suitable for the dashboard"""
-    transactions = get_transactions()
-    categories = get_categories()
-    
-    # Create a lookup dictionary for category names
-    category_lookup = {}
-    for category in categories['data']:
-        category_lookup[category['id']] = category['attributes']['name']
-    
-    # Process transaction data
-    formatted_data = []
-    for transaction in transactions['data']:
-        # Skip internal transfers between accounts to avoid double counting
-        if transaction['relationships']['category']['data'] and transaction['relationships']['category']['data']['id'] == 'transfer':
-            continue
-            
-        category_id = None
-        if transaction['relationships']['category']['data']:
-            category_id = transaction['relationships']['category']['data']['id']
-        
-        category_name = category_lookup.get(category_id, 'Uncategorized') if category_id else 'Uncategorized'
-        
-        # Include the full datetime and message field
-        settled_at = transaction['attributes'].get('settledAt')
-        created_at = transaction['attributes'].get('createdAt')
-        date_value = settled_at or created_at or None
-        transaction_data = {
-            'date': pd.to_datetime(date_value, utc=True) if date_value else None,
-            'description': transaction['attributes']['description'],
-            'amount': float(transaction['attributes']['amount']['value']),
-            'category': category_name,
-            'account_id': transaction['relationships']['account']['data']['id'],
-            'raw_text': transaction['attributes'].get('rawText', ''),
-            'tags': [tag['id'] for tag in transaction['relationships'].get('tags', {}).get('data', [])] if 'tags' in transaction['relationships'] else [],
-            'transactionType': transaction['attributes'].get('transactionType', '')
+    The three endpoints are independent, so a cold load takes as long as the
+    slowest of them rather than the sum. Returns a dict with the accounts and
+    categories responses in their usual formats, plus `transactions_table`,
+    the synced transactions as a memory-mapped Arrow table, `cube`, their
+    AggregateCube of monthly sums in timezone `tz`, and `version`, a hash of
+    the stored transactions and the categories (None for mock data).
+    """
+    token = token or get_api_token()
+    tz = tz or get_user_timezone()
+    if USE_MOCK_DATA:
+        table = resources_to_table(get_transaction_pages(token))
+        return {
+            'accounts': get_accounts(token),
+            'categories': get_categories(token),
+            'transactions_table': table,
+            'cube': AggregateCube.from_frame(cube_frame(table, tz), tz),
+            'version': None
         }
-        
-        # Add message if available
-        if 'message' in transaction['attributes'] and transaction['attributes']['message']:
-            transaction_data['message'] = transaction['attributes']['message']
-        
-        formatted_data.append(transaction_data)
-    
-    # Convert to DataFrame for easier processing
-    df = pd.DataFrame(formatted_data)
+
+    with ThreadPoolExecutor(max_workers=3) as pool:
+        # Run each task in a copy of this context so its timing spans count towards the current rerun
+        accounts_future = pool.submit(contextvars.copy_context().run, get_accounts, token)
+        categories_future = pool.submit(contextvars.copy_context().run, get_categories, token)
+        store_future = pool.submit(
+            contextvars.copy_context().run,
+            sync_transactions,
+            lambda: accounts_future.result()['data'],
+            token,
+            tz
+        )
+        store = store_future.result()
+        categories = categories_future.result()
+        with span('store.load'), store.locked():
+            content = store.content_version() + json.dumps(categories, sort_keys=True)
+            return {
+                'accounts': accounts_future.result(),
+                'categories': categories,
+                'transactions_table': store.load_table(),
+                'cube': store.load_cube(),
+                'version': hashlib.sha256(content.encode('utf-8')).hexdigest()
+            }
+
+def get_total_balance(snapshot):
+    """Calculate total balance across all accounts"""
+    total_cents = 0
     
-    # Add a month column for grouping
-    if not df.empty:
-        df['date'] = pd.to_datetime(df['date'])
-        df['month'] = df['date'].dt.strftime('%Y-%m')
+    for account in snapshot.accounts['data']:
+        total_cents += account['attributes']['balance']['valueInBaseUnits']
     
-    return df
+    return total_cents / 100
+
+def normalize_transactions(transaction_pages, categories, tz=DEFAULT_TIMEZONE):
+    """
+    Convert Up Banking transaction format to a format suitable for the dashboard.
+
+    `transaction_pages` is an iterable of pages (lists of transaction
+    resources), consumed one page at a time into columnar buffers. Returns
+    `(df, tags_df)`: amounts are exact int64 cents in `amount_cents`,
+    low-cardinality columns are categoricals, and tags live in the separate
+    long `tags_df` of (transaction_id, tag) pairs. Calendar columns such as
+    `month` and `local_date` are in timezone `tz`.
+    """
+    return frames_from_table(resources_to_table(transaction_pages), categories, tz)
+
+class TransactionSnapshot:
+    """Accounts, categories and normalized transactions fetched together at one point in time"""
 
-def get_monthly_income():
+    def __init__(self, accounts, categories, transactions_df, tags_df, cube, timezone=DEFAULT_TIMEZONE, fetched_at=None, version=None):
+        self.accounts = accounts
+        self.categories = categories
+        self.transactions_df = transactions_df
+        self.tags_df = tags_df
+        self.cube = cube
+        self.timezone = timezone
+        self.fetched_at = fetched_at or pd.Timestamp.now(tz='UTC')
+        self.category_names = {category['id']: category['attributes']['name'] for category in categories['data']}
+        self.version = version or next(_snapshot_versions)
+        self._time_index = None
+
+    def refreshed(self, accounts):
+        """A copy fetched now with new account balances, sharing this snapshot's frames, TimeIndex and views"""
+        snapshot = copy.copy(self)
+        snapshot.accounts = accounts
+        snapshot.fetched_at = pd.Timestamp.now(tz='UTC')
+        return snapshot
+
+    def time_index(self):
+        """TimeIndex of the transactions by local day, built once per snapshot"""
+        if self._time_index is None:
+            with span('time_index'):
+                self._time_index = TimeIndex(self.transactions_df)
+        return self._time_index
+
+    def view_data(self, key, compute):
+        """compute() for a dashboard view, run once per snapshot version and key; the result must not be mutated"""
+        return view_cache.get_or_build((self.version, self.timezone) + tuple(key), compute)
+
+    def now(self):
+        """Current time in the snapshot's timezone"""
+        return pd.Timestamp.now(tz=self.timezone)
+
+    def synced_at(self):
+        """When the data was fetched, in the snapshot's timezone"""
+        return pd.Timestamp(self.fetched_at).tz_convert(self.timezone)
+
+    def current_month(self):
+        """'%Y-%m' label of the current local month, as used by `month` and the cube"""
+        return self.now().strftime('%Y-%m')
+
+    def category_name(self, category_id):
+        """Display name of a category id, as used in the transactions frame"""
+        return self.category_names.get(category_id, 'Uncategorized')
+
+    def age_seconds(self):
+        """Seconds elapsed since the data was fetched"""
+        return (pd.Timestamp.now(tz='UTC') - self.fetched_at).total_seconds()
+
+    def is_expired(self, ttl=SNAPSHOT_TTL_SECONDS):
+        """Whether the snapshot is older than the given TTL in seconds"""
+        return self.age_seconds() > ttl
+
+    def memory_bytes(self):
+        """Approximate memory held by the snapshot's frames"""
+        return int(
+            self.transactions_df.memory_usage(deep=True).sum()
+            + self.tags_df.memory_usage(deep=True).sum()
+        )
+
+def build_snapshot(token=None, tz=None):
+    """
+    Fetch accounts, categories and transactions once and normalize them in
+    the user's timezone. If nothing stored has changed since the cached
+    snapshot, only its account balances are replaced. Pass `token` and `tz`
+    from a background thread.
+    """
+    token = token or get_api_token()
+    tz = tz or get_user_timezone()
+    with span('fetch'):
+        data = fetch_dashboard_data(token, tz)
+    # Reuse depends on the content version, not on age, so an expired snapshot will do
+    previous = snapshot_cache.peek((token_hash(token), tz), allow_expired=True)
+    if previous is not None and data['version'] is not None and previous.version == data['version']:
+        return previous.refreshed(data['accounts'])
+    with span('normalize'):
+        df, tags_df = frames_from_table(data['transactions_table'], data['categories'], tz)
+    return TransactionSnapshot(data['accounts'], data['categories'], df, tags_df, data['cube'], tz, version=data['version'])
+
+def snapshot_key():
+    """Cache key of the session user's snapshot: the token hash and timezone, never the raw token"""
+    return (token_hash(get_api_token()), get_user_timezone())
+
+def load_snapshot(force_refresh=False, ttl=SNAPSHOT_TTL_SECONDS):
+    """
+    Get the user's snapshot from the process-wide cache, fetching a new one
+    only if none is cached, it has expired or a refresh is forced.
+
+    Once loaded, the snapshot is kept fresh by a background worker, so later
+    reruns return the cached snapshot without waiting for the API. While
+    that worker runs, an expired snapshot is still served, so failing or
+    slow background syncs show the last synced data instead of blocking.
+    """
+    key = snapshot_key()
+    build = partial(build_snapshot, get_api_token(), get_user_timezone())
+    snapshot = snapshot_cache.get_or_build(key, build, ttl=ttl, force=force_refresh,
+                                           allow_expired=refresher.is_refreshing(key))
+    refresher.touch(key, build)
+    return snapshot
+
+def background_refresh_error():
+    """The error from the user's latest background refresh, if it is still failing"""
+    return refresher.last_error(snapshot_key())
+
+def stop_background_refresh():
+    """Stop refreshing the user's snapshot in the background (e.g. on logout)"""
+    refresher.stop(snapshot_key())
+
+def invalidate_snapshot():
+    """Drop the user's cached snapshot so the next load fetches fresh data"""
+    snapshot_cache.pop(snapshot_key())
+
+def invalidate_token_snapshots(token):
+    """Drop a token's cached snapshots in every timezone, e.g. after a webhook changed its store"""
+    hashed = token_hash(token)
+    snapshot_cache.pop_where(lambda key: key[0] == hashed)
+
+def format_transactions_for_dashboard(snapshot=None):
+    """Get the dashboard transactions DataFrame, loading the session snapshot if none is given"""
+    if snapshot is None:
+        snapshot = load_snapshot()
+    return snapshot.transactions_df
+
+@timed('aggregate.monthly_income')
+def get_monthly_income(snapshot):
     """Calculate monthly income from salary transactions only"""
-    df = format_transactions_for_dashboard()
-    if df.empty:
+    if snapshot.transactions_df.empty:
         return 0.0
     # Only include salary transactions for the current month
-    current_month = datetime.now().strftime('%Y-%m')
-    salary_df = df[(df['transactionType'] == 'Salary') & (df['month'] == current_month)]
-    monthly_income = salary_df['amount'].sum()
+    monthly_income = snapshot.cube.total_cents(month=snapshot.current_month(), transaction_types=['Salary']) / 100
     return monthly_income
 
-def get_estimated_annual_income():
+@timed('aggregate.estimated_annual_income')
+def get_estimated_annual_income(snapshot):
     """Estimate annual income by summing all salary transactions for the previous month and multiplying by 12"""
-    df = format_transactions_for_dashboard()
-    if df.empty:
+    if snapshot.transactions_df.empty:
         return 0.0, 0.0, [], pd.DataFrame(), None
-    # Only include salary transactions
-    salary_df = df[df['transactionType'] == 'Salary']
-   
     # Find the previous month with salary
-    all_months = sorted(salary_df['month'].unique())
+    all_months = snapshot.cube.months_with(transaction_types=['Salary'])
     if len(all_months) < 2:
         # Not enough data for previous month, fallback to most recent
         prev_month = all_months[-1]
     else:
         prev_month = all_months[-2]
-    prev_salary_df = salary_df[salary_df['month'] == prev_month]
-    monthly_salary = prev_salary_df['amount'].sum()
+    monthly_salary = snapshot.cube.total_cents(month=prev_month, transaction_types=['Salary']) / 100
     return monthly_salary * 12
-def get_monthly_expenses_by_category():
+
+def _expenses_by_category(snapshot, month, **filters):
+    """Positive dollar expenses per category name for one month, from the cube"""
+    category_cents = {}
+    for _, category_id, _, _, _, sum_cents, _ in snapshot.cube.cells(month=month, sign=-1, **filters):
+        name = snapshot.category_name(category_id)
+        category_cents[name] = category_cents.get(name, 0) + sum_cents
+    return {name: -category_cents[name] / 100 for name in sorted(category_cents)}
+
+@timed('aggregate.monthly_expenses_by_category')
+def get_monthly_expenses_by_category(snapshot):
     """Get monthly expenses grouped by category"""
-    df = format_transactions_for_dashboard()
-    
-    if df.empty:
+    if snapshot.transactions_df.empty:
         return {}
     
-    # Filter expense transactions (negative amounts) and make them positive for easier processing
-    expenses_df = df[(df['amount'] < 0) & (~df['transactionType'].isin(['Transfer', 'Round Up']))].copy()
-    expenses_df['amount'] = expenses_df['amount'].abs()
-    
-    # Get current month's expenses
-    current_month = datetime.now().strftime('%Y-%m')
-    current_month_df = expenses_df[expenses_df['month'] == current_month]
-    
-    # If no data for current month, use most recent month
-    if current_month_df.empty and not expenses_df.empty:
-        most_recent_month = expenses_df['month'].max()
-        current_month_df = expenses_df[expenses_df['month'] == most_recent_month]
-    
-    # Group by category
-    if not current_month_df.empty:
-        category_expenses = current_month_df.groupby('category')['amount'].sum()
-        return category_expenses.to_dict()
+    # Expense transactions (negative amounts), excluding movements between accounts
+    filters = {'exclude_types': ('Transfer', 'Round Up')}
+    expense_months = snapshot.cube.months_with(sign=-1, **filters)
+    if not expense_months:
+        return {}
     
-    return {}
+    # Get current month's expenses, or the most recent month's if there are none yet
+    current_month = snapshot.current_month()
+    month = current_month if current_month in expense_months else expense_months[-1]
+    return _expenses_by_category(snapshot, month, **filters)
 
-def get_monthly_spending_trends():
+@timed('aggregate.monthly_spending_trends')
+def get_monthly_spending_trends(snapshot):
     """Get monthly spending trends over time"""
-    df = format_transactions_for_dashboard()
-    
-    if df.empty:
+    if snapshot.transactions_df.empty:
         return pd.DataFrame()
     
-    # Filter expense transactions (negative amounts) and make them positive for easier processing
-    expenses_df = df[df['amount'] < 0].copy()
-    expenses_df['amount'] = expenses_df['amount'].abs()
-    
-    # Group by month and category
-    monthly_data = expenses_df.groupby(['month', 'category'])['amount'].sum().reset_index()
-    
-    return monthly_data
+    # Expense transactions (negative amounts) by month and category, as positive dollars
+    rows = [
+        {'month': month, 'category': category, 'amount': amount}
+        for month in snapshot.cube.months_with(sign=-1)
+        for category, amount in _expenses_by_category(snapshot, month).items()
+    ]
+    return pd.DataFrame(rows, columns=['month', 'category', 'amount'])
+
+@timed('aggregate.spending_trend')
+def get_spending_trend(snapshot, granularity='auto', max_points=TREND_MAX_POINTS, by_category=False):
+    """
+    Expenses over the whole history, reduced to at most about max_points points.
+
+    'day' gives a daily line series (empty days as 0) downsampled with LTTB.
+    'week', 'month', 'quarter' and 'year' give bar buckets, coarsened until
+    they fit; 'auto' picks the finest bucket that fits. Returns columns
+    period (the bucket or day start), category (with by_category, buckets
+    only) and amount in positive dollars.
+    """
+    columns = ['period', 'category', 'amount'] if by_category and granularity != 'day' else ['period', 'amount']
+    df = snapshot.transactions_df
+    expenses = df[(df['amount_cents'] < 0) & ~df['transactionType'].isin(['Transfer', 'Round Up']) & df['local_date'].notna()]
+    if expenses.empty:
+        return pd.DataFrame(columns=columns)
+    # Rows are sorted by date, so the first and last are the range
+    start, end = expenses['local_date'].iloc[0], expenses['local_date'].iloc[-1]
+
+    if granularity == 'day':
+        daily = expenses.groupby('local_date')['amount_cents'].sum()
+        daily = daily.reindex(pd.date_range(start, end, freq='D'), fill_value=0)
+        keep = lttb(daily.index.asi8, daily.to_numpy(), max_points)
+        return pd.DataFrame({'period': daily.index[keep], 'amount': -daily.to_numpy()[keep] / 100})
+
+    frequency = bucket_frequency(start, end, max_points, 'day' if granularity == 'auto' else granularity)
+    # Sum per day first, so only the few thousand days are mapped to buckets rather than every row
+    day_keys = ['local_date', 'category'] if by_category else ['local_date']
+    daily = expenses.groupby(day_keys, observed=True)['amount_cents'].sum().reset_index()
+    daily['local_date'] = bucket_starts(daily['local_date'], frequency)
+    trend = daily.groupby(day_keys, observed=True, sort=True)['amount_cents'].sum().reset_index()
+    trend.columns = columns
+    trend['amount'] = -trend['amount'] / 100
+    return trend
 
-def debug_up_api_service():
+def debug_up_api_service(snapshot=None):
     st.header("🐞 up_api_service.py Debug View")
-    df = format_transactions_for_dashboard()
+    if snapshot is None:
+        snapshot = load_snapshot()
+    st.subheader("Snapshot Cache")
+    st.write(snapshot_cache.stats())
+    st.subheader("View Cache")
+    st.write(view_cache.stats())
+    st.subheader("Up API Client")
+    st.write(client.metrics())
+    st.subheader("Stage Timings")
+    st.caption("This rerun, and p50/p95 over recent reruns. Enable with UP_TIMING=1.")
+    st.dataframe(pd.DataFrame(summary(current_run())))
+    st.download_button("Export timings (JSON)", export_json(), file_name="timings.json", mime="application/json")
+    df = format_transactions_for_dashboard(snapshot)
     st.subheader("All Transactions DataFrame")
     st.write(df)
     st.subheader("Salary Transactions DataFrame")
     salary_df = df[df['transactionType'] == 'Salary']
     st.write(salary_df)
-    current_month = datetime.now().strftime('%Y-%m')
+    current_month = snapshot.current_month()
     st.write(df[(df['transactionType'] == 'Salary') & (df['month'] == current_month)])
 
     st.subheader("All Months with Salary Transactions")
@@ -252,7 +454,7 @@ def debug_up_api_service():
     st.subheader("Annual Income Calculation")
     if prev_month:
         prev_salary_df = salary_df[salary_df['month'] == prev_month]
-        monthly_salary = prev_salary_df['amount'].sum()
+        monthly_salary = prev_salary_df['amount_cents'].sum() / 100
         st.write({
             "monthly_salary": monthly_salary,
             "estimated_annual_income": monthly_salary * 12
@@ -0,0 +1,273 @@
+'''
+Shared HTTP client for the Up Banking API with connection pooling, retries and rate limiting
+'''
+
+import hashlib
+import os
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from timing import span
+
+# Point UP_API_BASE_URL at mock_up_server.py to exercise the whole fetch path offline
+API_BASE_URL = os.environ.get('UP_API_BASE_URL', "https://api.up.com.au/api/v1")
+
+# (connect, read) timeouts in seconds
+DEFAULT_TIMEOUT = (5, 30)
+DEFAULT_MAX_RETRIES = 4
+# Exponential backoff starts at BACKOFF_BASE seconds and never waits longer than BACKOFF_MAX
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 30.0
+# Connections kept alive per host; sized for the concurrent loaders
+POOL_SIZE = 16
+
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+def rate_limit_setting(value, default):
+    """(requests per second, burst size) from a 'rate,burst' setting such as '25,50', or `default` if unset"""
+    if not value:
+        return default
+    rate, _, burst = value.partition(',')
+    return float(rate), int(burst) if burst else max(1, int(float(rate) * 2))
+
+# Token-bucket limits (requests per second, burst size) for the whole process and for each API token,
+# overridable with UP_PROCESS_RATE_LIMIT and UP_TOKEN_RATE_LIMIT. The per-token bucket is sized so one
+# user's first sync keeps all of transaction_sync.MAX_CONCURRENT_REQUESTS busy (8 requests at 200-400 ms
+# each is 20-40 a second). Lowering it is gentler on the API and makes 429s less likely, but every
+# page of a first sync waits its turn: at 5 a second a 1000-page history takes over 3 minutes.
+PROCESS_RATE_LIMIT = rate_limit_setting(os.environ.get('UP_PROCESS_RATE_LIMIT'), (60.0, 120))
+TOKEN_RATE_LIMIT = rate_limit_setting(os.environ.get('UP_TOKEN_RATE_LIMIT'), (30.0, 60))
+
+class UpApiError(Exception):
+    """Error returned by (or while talking to) the Up API"""
+
+    def __init__(self, message, status_code=None, url=None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.url = url
+
+class UpAuthError(UpApiError):
+    """The API token is missing, invalid or revoked (HTTP 401)"""
+
+class UpRateLimitError(UpApiError):
+    """Still rate limited (HTTP 429) after all retries"""
+
+class UpServerError(UpApiError):
+    """The API kept failing with a 5xx response after all retries"""
+
+class UpConnectionError(UpApiError):
+    """The API could not be reached or did not answer within the timeout"""
+
+def parse_retry_after(value):
+    """Seconds to wait from a Retry-After header (delta-seconds or HTTP date), or None"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+class TokenBucket:
+    """Thread-safe token bucket refilling `rate` tokens a second, up to `capacity`"""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Take a token, sleeping until it is available; returns the seconds waited"""
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            # Going negative reserves the next token, so waiters are served in arrival order
+            self.tokens -= 1
+            wait = max(0.0, -self.tokens / self.rate)
+        if wait:
+            time.sleep(wait)
+        return wait
+
+class _InFlight:
+    """A request other threads can wait on instead of sending it again"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+    def wait(self):
+        self.done.wait()
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+class UpClient:
+    """
+    Thin wrapper around a pooled requests.Session.
+
+    Connections are kept alive between calls, so paginated crawls reuse one
+    TLS connection instead of handshaking for every page. 5xx and 429
+    responses and connection failures are retried with exponential backoff
+    and full jitter, honouring Retry-After when the API sends it.
+
+    Every request first takes a token from a per-API-token bucket and from
+    one bucket for the whole client, so a burst of sessions queues briefly
+    instead of being rate limited. Identical GETs already in flight (same
+    URL, params and token) are coalesced: later callers wait for the first
+    one and get the same decoded body, which must not be mutated.
+    """
+
+    def __init__(self, base_url=API_BASE_URL, timeout=DEFAULT_TIMEOUT, max_retries=DEFAULT_MAX_RETRIES,
+                 backoff_base=BACKOFF_BASE, backoff_max=BACKOFF_MAX, pool_size=POOL_SIZE,
+                 process_rate_limit=PROCESS_RATE_LIMIT, token_rate_limit=TOKEN_RATE_LIMIT):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.process_bucket = TokenBucket(*process_rate_limit)
+        self.token_rate_limit = token_rate_limit
+        self.token_buckets = {}
+        self.counters = {
+            'calls': 0,
+            'coalesced': 0,
+            'requests': 0,
+            'retries': 0,
+            'rate_limited': 0,
+            'queue_seconds': 0.0,
+            'max_queue_seconds': 0.0
+        }
+        self._in_flight = {}
+        self._lock = threading.Lock()
+
+    def url_for(self, path_or_url):
+        """Resolve an API path like '/accounts' against the base URL; absolute URLs pass through"""
+        if path_or_url.startswith(('http://', 'https://')):
+            return path_or_url
+        return f"{self.base_url}/{path_or_url.lstrip('/')}"
+
+    def backoff_delay(self, attempt, retry_after=None):
+        """Seconds to sleep before retry number `attempt` (0-based), never much more than backoff_max"""
+        if retry_after is not None:
+            # The server told us when to come back; add a little jitter so sessions don't retry in lockstep
+            return min(retry_after, self.backoff_max) + random.uniform(0, self.backoff_base)
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def throttle(self, token=None):
+        """Wait for the token's and the client's rate limits, returning the seconds queued"""
+        token_key = _token_key(token)
+        with self._lock:
+            bucket = self.token_buckets.get(token_key)
+            if bucket is None:
+                bucket = self.token_buckets[token_key] = TokenBucket(*self.token_rate_limit)
+        waited = bucket.acquire() + self.process_bucket.acquire()
+        with self._lock:
+            self.counters['requests'] += 1
+            self.counters['queue_seconds'] += waited
+            self.counters['max_queue_seconds'] = max(self.counters['max_queue_seconds'], waited)
+        return waited
+
+    def metrics(self):
+        """Request counts and rate-limiter queue times since the client was created"""
+        with self._lock:
+            metrics = dict(self.counters)
+            metrics['in_flight'] = len(self._in_flight)
+        metrics['avg_queue_seconds'] = metrics['queue_seconds'] / metrics['requests'] if metrics['requests'] else 0.0
+        return metrics
+
+    def get_json(self, path_or_url, params=None, token=None):
+        """GET an API path or absolute URL and return the decoded JSON body"""
+        url = self.url_for(path_or_url)
+        key = (url, tuple(sorted((params or {}).items())), _token_key(token))
+        with self._lock:
+            self.counters['calls'] += 1
+            call = self._in_flight.get(key)
+            leader = call is None
+            if leader:
+                call = self._in_flight[key] = _InFlight()
+            else:
+                self.counters['coalesced'] += 1
+        if not leader:
+            return call.wait()
+        try:
+            call.result = self._get_json(url, params, token)
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+            call.done.set()
+        return call.result
+
+    def _get_json(self, url, params, token):
+        headers = {"Authorization": f"Bearer {token}"} if token else {}
+
+        for attempt in range(self.max_retries + 1):
+            retry_after = None
+            if attempt:
+                with self._lock:
+                    self.counters['retries'] += 1
+            self.throttle(token)
+            try:
+                with span('api.request'):
+                    response = self.session.get(url, headers=headers, params=params, timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if attempt == self.max_retries:
+                    raise UpConnectionError(f"Could not reach Up API: {str(e)}", url=url) from e
+            else:
+                if response.status_code < 400:
+                    with span('api.json_decode'):
+                        return response.json()
+                if response.status_code == 429:
+                    with self._lock:
+                        self.counters['rate_limited'] += 1
+                if response.status_code == 401:
+                    raise UpAuthError("Up API rejected the token", status_code=401, url=url)
+                if response.status_code not in RETRY_STATUS_CODES:
+                    raise UpApiError(
+                        f"Up API returned {response.status_code}: {response.text[:200]}",
+                        status_code=response.status_code, url=url
+                    )
+                error_class = UpRateLimitError if response.status_code == 429 else UpServerError
+                if attempt == self.max_retries:
+                    raise error_class(
+                        f"Up API returned {response.status_code} after {attempt + 1} attempts",
+                        status_code=response.status_code, url=url
+                    )
+                retry_after = parse_retry_after(response.headers.get('Retry-After'))
+                if retry_after is not None and retry_after > self.backoff_max:
+                    # Sleeping that long would hold up the caller (e.g. a rerun); fail now and let it try again later
+                    raise error_class(
+                        f"Up API returned {response.status_code} and asked to retry after {retry_after:.0f}s",
+                        status_code=response.status_code, url=url
+                    )
+            time.sleep(self.backoff_delay(attempt, retry_after))
+
+    def close(self):
+        """Close pooled connections"""
+        self.session.close()
+
+def _token_key(token):
+    # Buckets and in-flight requests are keyed by a hash, so the raw token is not kept around as a key
+    return hashlib.sha256(token.encode('utf-8')).hexdigest() if token else ''
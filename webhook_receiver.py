@@ -0,0 +1,151 @@
+'''
+Receiver for Up Banking webhook events that applies each transaction change to the local store
+
+Run from the repository root:
+    UP_API_TOKEN=... UP_WEBHOOK_SECRET=... python webhook_receiver.py [port]
+webhook_replay.py checks it against recorded mock events.
+'''
+
+import hashlib
+import hmac
+import json
+import os
+import sys
+import threading
+from functools import partial
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+from up_client import UpApiError
+
+# Up signs every delivery with HMAC-SHA256 of the raw body, keyed by the webhook's secretKey
+SIGNATURE_HEADER = 'X-Up-Authenticity-Signature'
+WEBHOOK_PORT = 8502
+
+TRANSACTION_EVENTS = {'TRANSACTION_CREATED', 'TRANSACTION_SETTLED', 'TRANSACTION_DELETED'}
+
+def sign(secret_key, body):
+    """Hex HMAC-SHA256 signature of a raw request body"""
+    return hmac.new(secret_key.encode('utf-8'), body, hashlib.sha256).hexdigest()
+
+def verify_signature(secret_key, body, signature):
+    """Whether `signature` is the body's signature, compared in constant time"""
+    return bool(signature) and hmac.compare_digest(sign(secret_key, body), signature)
+
+class WebhookProcessor:
+    """
+    Applies webhook events to a transaction_store.TransactionStore.
+
+    Created and settled events fetch only the affected transaction through
+    `get_transaction(transaction_id)` and apply it with store.apply();
+    deleted events, and transactions the API no longer has (a 404, e.g. a
+    HELD transaction reversed before its event arrived), call
+    store.delete(). Either way only that transaction's
+    row and cube cell are touched. `on_change` is called after every event
+    that changed the store, e.g. to drop cached snapshots.
+    """
+
+    def __init__(self, store, get_transaction, on_change=None):
+        self.store = store
+        self.get_transaction = get_transaction
+        self.on_change = on_change
+        # The store is not thread-safe and the server handles requests concurrently
+        self._lock = threading.Lock()
+
+    def handle(self, event):
+        """Apply one webhook event body, returning how many transactions changed"""
+        data = event['data']
+        event_type = data['attributes']['eventType']
+        if event_type not in TRANSACTION_EVENTS:
+            # PING and any future event types need no action
+            return 0
+        transaction_id = data['relationships']['transaction']['data']['id']
+        with self._lock:
+            if event_type == 'TRANSACTION_DELETED':
+                changed = self.store.delete(transaction_id)
+            else:
+                try:
+                    resource = self.get_transaction(transaction_id)['data']
+                except UpApiError as e:
+                    if e.status_code != 404:
+                        raise
+                    resource = None
+                changed = self.store.delete(transaction_id) if resource is None else self.store.apply(resource)
+        if changed and self.on_change:
+            self.on_change()
+        return changed
+
+def make_handler(processor, secret_key):
+    """A request handler class that verifies and processes webhook deliveries"""
+
+    class WebhookHandler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+            if not verify_signature(secret_key, body, self.headers.get(SIGNATURE_HEADER)):
+                self.send_error(401, "Invalid signature")
+                return
+            try:
+                event = json.loads(body)
+            except ValueError:
+                self.send_error(400, "Body is not JSON")
+                return
+            try:
+                processor.handle(event)
+            except UpApiError as e:
+                # A non-2xx response makes Up deliver the event again later
+                print(f"Error applying webhook event: {str(e)}")
+                self.send_error(502, "Could not fetch the transaction")
+                return
+            except Exception as e:
+                # An event of an unexpected shape would fail on every redelivery
+                print(f"Error applying webhook event: {str(e)}")
+                self.send_error(400, "Could not apply the event")
+                return
+            self.send_response(200)
+            self.end_headers()
+
+    return WebhookHandler
+
+def make_server(processor, secret_key, host='127.0.0.1', port=WEBHOOK_PORT):
+    """An HTTP server for webhook deliveries; call serve_forever() on it"""
+    return ThreadingHTTPServer((host, port), make_handler(processor, secret_key))
+
+def replay_events(url, events, secret_key):
+    """POST recorded events to a receiver signed the way Up signs them, returning the status codes"""
+    statuses = []
+    for event in events:
+        body = json.dumps(event).encode('utf-8')
+        headers = {'Content-Type': 'application/json', SIGNATURE_HEADER: sign(secret_key, body)}
+        statuses.append(requests.post(url, data=body, headers=headers, timeout=10).status_code)
+    return statuses
+
+def processor_for_token(token):
+    """
+    A WebhookProcessor for a token's store whose on_change drops the token's
+    cached snapshots in this process, so the next rerun shows the change.
+    """
+    import up_api_service
+    from transaction_store import TransactionStore
+
+    return WebhookProcessor(
+        TransactionStore.for_token(token),
+        partial(up_api_service.get_transaction, token=token),
+        on_change=partial(up_api_service.invalidate_token_snapshots, token)
+    )
+
+def serve_in_background(token, secret_key, host='0.0.0.0', port=WEBHOOK_PORT):
+    """Run the receiver on a daemon thread of this process, e.g. inside the dashboard, returning the server"""
+    server = make_server(processor_for_token(token), secret_key, host=host, port=port)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def main(port=WEBHOOK_PORT):
+    token = os.environ['UP_API_TOKEN']
+    secret_key = os.environ['UP_WEBHOOK_SECRET']
+    server = make_server(processor_for_token(token), secret_key, host='0.0.0.0', port=port)
+    print(f"Listening for Up webhook events on port {port}")
+    server.serve_forever()
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else WEBHOOK_PORT)
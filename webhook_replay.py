@@ -0,0 +1,125 @@
+'''
+Replay the recorded mock webhook events through a real receiver into a throwaway store, checking it after each one
+
+Run from the repository root:
+    python webhook_replay.py
+
+Exits with status 1 if any check fails.
+'''
+
+import sys
+import tempfile
+import threading
+
+import mock_data
+from aggregate_cube import AggregateCube
+from transaction_store import TransactionStore, cube_frame
+from up_client import UpApiError
+from webhook_receiver import TRANSACTION_EVENTS, WebhookProcessor, make_server, replay_events
+
+def mock_transaction_fetcher(transactions):
+    """A get_transaction(transaction_id) over `transactions` (id -> resource), failing with a 404 for other ids"""
+    def get_transaction(transaction_id):
+        if transaction_id not in transactions:
+            raise UpApiError(f"Transaction {transaction_id} not found", status_code=404)
+        return {'data': transactions[transaction_id]}
+    return get_transaction
+
+def check_store(path, expected_ids, transactions):
+    """
+    Problems found when reading the store at `path` afresh: rows other than
+    `expected_ids`, or a cube that disagrees with their amounts or with a
+    rebuild from the table. `transactions` maps ids to raw resources.
+    """
+    store = TransactionStore(path)
+    table = store.load_table()
+    cube = store.load_cube()
+    problems = []
+    ids = set(table['id'].to_pylist())
+    if ids != expected_ids:
+        problems.append(f"rows {sorted(ids ^ expected_ids)} differ")
+    expected_cents = sum(transactions[id_]['attributes']['amount']['valueInBaseUnits'] for id_ in expected_ids)
+    cube_cents = cube.total_cents(exclude_categories=())
+    if cube_cents != expected_cents:
+        problems.append(f"cube total {cube_cents} != {expected_cents}")
+    rebuilt = AggregateCube.from_frame(cube_frame(table, store.tz), store.tz)
+    if sorted(map(repr, cube.to_json())) != sorted(map(repr, rebuilt.to_json())):
+        problems.append("cube cells differ from a rebuild")
+    return problems
+
+def transaction_event(event_type, transaction_id):
+    """A webhook event body of `event_type` for one transaction, shaped like Up's"""
+    return {
+        'data': {
+            'type': 'webhook-events',
+            'attributes': {'eventType': event_type},
+            'relationships': {'transaction': {'data': {'type': 'transactions', 'id': transaction_id}}}
+        }
+    }
+
+def replay_mock_events():
+    """
+    Replay the recorded mock events, then a settled event for a transaction
+    the API no longer has and a malformed event, checking the stored rows
+    and cube after each one. The receiver's store loads everything before
+    the transactions the delete events remove are written by a second
+    instance, as the dashboard's sync would. Returns whether every check passed.
+    """
+    events = mock_data.get_webhook_events_data()
+    transactions = {t['id']: t for t in mock_data.get_transactions_data()['data']}
+    event_ids = {
+        event_type: {event['data']['relationships']['transaction']['data']['id']
+                     for event in events if event['data']['attributes']['eventType'] == event_type}
+        for event_type in TRANSACTION_EVENTS
+    }
+    created, deleted = event_ids['TRANSACTION_CREATED'], event_ids['TRANSACTION_DELETED']
+    # Stored, but gone from the API by the time its settled event is handled
+    vanished = next(id_ for id_ in transactions if id_ not in created | deleted)
+    fetchable = {id_: t for id_, t in transactions.items() if id_ != vanished}
+    failures = []
+    with tempfile.TemporaryDirectory() as path:
+        store = TransactionStore(path)
+        # Leave out the transactions the recorded events create, and those the second instance writes
+        store.upsert(t for id_, t in transactions.items() if id_ not in created | deleted)
+        store.load_table()
+        store.load_cube()
+        TransactionStore(path).upsert(transactions[id_] for id_ in deleted)
+        expected = set(transactions) - created
+
+        processor = WebhookProcessor(store, mock_transaction_fetcher(fetchable))
+        server = make_server(processor, mock_data.webhook_secret_key, port=0)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        url = f"http://127.0.0.1:{server.server_address[1]}/"
+        cases = [(event, 200) for event in events] + [
+            (transaction_event('TRANSACTION_SETTLED', vanished), 200),
+            ({'data': {'attributes': {'eventType': 'TRANSACTION_SETTLED'}}}, 400)
+        ]
+        try:
+            for event, expected_status in cases:
+                status = replay_events(url, [event], mock_data.webhook_secret_key)[0]
+                attributes = event['data']['attributes']
+                # PING events, and the malformed one, name no transaction
+                transaction = event['data'].get('relationships', {}).get('transaction')
+                if transaction is not None:
+                    transaction_id = transaction['data']['id']
+                    if attributes['eventType'] == 'TRANSACTION_CREATED':
+                        expected.add(transaction_id)
+                    elif attributes['eventType'] == 'TRANSACTION_DELETED' or transaction_id == vanished:
+                        expected.discard(transaction_id)
+                problems = [f"status {status}, expected {expected_status}"] if status != expected_status else []
+                problems += check_store(path, expected, transactions)
+                print(f"{attributes['eventType']:<22}{status}  {'; '.join(problems) or 'ok'}")
+                failures.extend(problems)
+            bad = replay_events(url, events[:1], 'wrong-secret')[0]
+            print(f"{'bad signature':<22}{bad}  {'ok' if bad == 401 else 'expected 401'}")
+            if bad != 401:
+                failures.append("bad signature accepted")
+            print(f"stored transactions:  {len(expected)}")
+        finally:
+            server.shutdown()
+            server.server_close()
+    print("All checks passed" if not failures else f"{len(failures)} check(s) failed")
+    return not failures
+
+if __name__ == '__main__':
+    sys.exit(0 if replay_mock_events() else 1)